@@ -0,0 +1,440 @@
+import math
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+from numba import jit, prange
+
+from gym_treechop.WorldPool import WorldPool
+from gym_treechop.observation import OBSERVATION_VIEWPORT_START, VIEWPORT_RES_X, VIEWPORT_RES_Y, VIEWPORT_FOV, \
+    VIEWPORT_KEY_SIZE, getActionsCount, getObservationsCount, numba_renderViewport, getViewportRays, \
+    numba_updateViewportKey
+from gym_treechop.game.constants import DELTA, WORLD_SHAPE, BlockHardness, BLOCK_TYPES, HARDNESS_MULTIPLIER, \
+    BREAKING_RANGE, JUMP_VELOCITY, WALK_VELOCITY
+from gym_treechop.game.game import Game, createRandomGame, numba_getBlockInFront, numba_getLookingDirectionVector, \
+    numba_getNextWoodBlock, numba_updateLowestWood, numba_getDistanceToNearestTree, GROUND, WOOD, LEAF
+from gym_treechop.game.structures import Vec3
+from gym_treechop.game.physiscs import numba_physicsStep
+from gym_treechop.game.profiler import StepProfiler
+from gym_treechop.game.utils import numba_playerIsStanding
+from gym_treechop.rewards import REWARD_TERMS, RewardWeights, getRewardWeightsArray, getRewardTerms, \
+    numba_computeReward
+
+# Block hardness indexed by block id
+BLOCK_HARDNESS = np.array([BlockHardness[block] for block in BLOCK_TYPES], dtype=np.float64)
+
+# Events of TreeChopEnv (EpisodeEvents) counted by the numba step, in the order of the event counts of a world.
+# Chopped block b is counted at EVENT_CHOPPED + b - GROUND
+EPISODE_EVENTS = ("chopped_ground", "chopped_wood", "chopped_leaf", "target_look", "target_look_standing")
+EVENT_CHOPPED, EVENT_TARGET_LOOK, EVENT_TARGET_LOOK_STANDING = 0, 3, 4
+
+
+##### NUMBA functions #####
+@jit(nopython=True, cache=True)
+def numba_lookUpDown(rotation: np.ndarray, radian: float):
+    rotation[1] = max(0, min(math.pi, radian))
+
+
+@jit(nopython=True, cache=True)
+def numba_lookLeftRight(rotation: np.ndarray, radian: float):
+    rotation[0] = (radian + 100 * math.pi) % math.tau
+
+
+@jit(nopython=True, cache=True)
+def numba_attackBlock(environment: np.ndarray, woodPerLayer: np.ndarray, trees: np.ndarray, lowestWood: np.ndarray,
+                      position: np.ndarray, rotation: np.ndarray, attackedBlock: np.ndarray,
+                      attackTicksRemaining: np.ndarray, i: int, delta: float) -> int:
+    # Same as Game.attackBlock, returns destroyed block id, 0 otherwise
+    head = (position[0], position[1], position[2] + 1)
+    block, x, y, z = numba_getBlockInFront(environment, head, numba_getLookingDirectionVector(rotation),
+                                           BREAKING_RANGE)
+    if x != attackedBlock[0] or y != attackedBlock[1] or z != attackedBlock[2]:
+        # Currently attacked block is no longer attacked
+        attackedBlock[:] = -1
+        attackTicksRemaining[i] = 0
+
+    if block:
+        if attackedBlock[0] == -1:
+            attackedBlock[0], attackedBlock[1], attackedBlock[2] = x, y, z
+            attackTicksRemaining[i] = BLOCK_HARDNESS[block] * HARDNESS_MULTIPLIER * 20 - 1e-6  # for rounding errors
+
+        # Some block is attacked
+        attackStrength = 20 * delta  # 20ticks per second
+        if not numba_playerIsStanding(position, environment):
+            attackStrength /= 5
+
+        attackTicksRemaining[i] -= attackStrength
+
+        if attackTicksRemaining[i] <= 0:
+            environment[z, y, x] = 0
+            if block == WOOD:
+                woodPerLayer[z] -= 1
+                numba_updateLowestWood(environment, trees, lowestWood, x, y)
+            return block
+
+    return 0
+
+
+@jit(nopython=True, cache=True)
+def numba_isGameOver(environment: np.ndarray, position: np.ndarray) -> bool:
+    return (environment.shape[2] < position[0] or position[0] < 0
+            or environment.shape[1] < position[1] or position[1] < 0
+            or environment.shape[0] < position[2] or position[2] < 0)
+
+
+@jit(nopython=True, cache=True)
+def numba_writeObservation(environment: np.ndarray, trees: np.ndarray, lowestWood: np.ndarray, position: np.ndarray,
+                           velocity: np.ndarray, rotation: np.ndarray, rays: np.ndarray, observation: np.ndarray,
+                           viewportKey: np.ndarray, worldVersion: int) -> bool:
+    # Same as TreeChopEnv._getObservation, written into the observation row. Returns if the viewport was reused
+    head = (position[0], position[1], position[2] + 1)
+
+    # player_velocity_upDown - only up/down
+    observation[0] = velocity[2] / 3.92  # Terminal velocity = 3.92 -> -1 - 1
+
+    # distance_to_block_to_destroy
+    blockX, blockY, blockZ = numba_getNextWoodBlock(trees, lowestWood, (position[0], position[1], position[2]))
+    distanceToBlock = math.sqrt((head[0] - blockX) ** 2 + (head[1] - blockY) ** 2 + (head[2] - blockZ) ** 2)
+    observation[1] = max(0, min(1, distanceToBlock / 5))
+
+    # rotation_to_block_to_destroy - leftRight -> -1PI - 1PI -> -1 - 1
+    b = blockX + 0.5 - head[0]
+    a = blockY + 0.5 - head[1]
+    leftRight = (math.atan(b / a) if a else math.copysign(math.pi / 2, b)) - math.pi / 2
+    if a < 0:
+        leftRight += math.pi
+    observation[2] = -leftRight / math.pi
+
+    # rotation_to_block_to_destroy - upDown -> -0.5PI - 0.5PI -> -1 - 1
+    c = distanceToBlock
+    b = max(-c, min(c, blockZ + 0.5 - head[2]))
+    observation[3] = math.asin(b / c) / (math.pi / 2)
+
+    # looking_at [ground, wood, leaf]
+    block, _, _, _ = numba_getBlockInFront(environment, head, numba_getLookingDirectionVector(rotation),
+                                           BREAKING_RANGE)
+    observation[4] = 1 if block == GROUND else 0  # Penalty for destroy
+    observation[5] = 1 if block == LEAF or block == WOOD else 0  # No penalty
+
+    # viewport - still in the observation row when the view did not change
+    playerPos = (position[0], position[1], position[2])
+    reused = numba_updateViewportKey(viewportKey, playerPos, (rotation[0], rotation[1]), worldVersion)
+    if not reused:
+        viewport = observation[OBSERVATION_VIEWPORT_START:].reshape(rays.shape[:2])
+        numba_renderViewport(numba_getLookingDirectionVector(rotation), environment, playerPos, rays, viewport)
+
+    # Clip everything in range -1 to 1
+    for j in range(OBSERVATION_VIEWPORT_START if reused else observation.shape[0]):
+        observation[j] = max(-1, min(1, observation[j]))
+    return reused
+
+
+@jit(nopython=True, cache=True)
+def numba_worldStep(environment: np.ndarray, woodPerLayer: np.ndarray, trees: np.ndarray, lowestWood: np.ndarray,
+                    position: np.ndarray, velocity: np.ndarray, rotation: np.ndarray, attackedBlock: np.ndarray,
+                    attackTicksRemaining: np.ndarray, lookingRewards: np.ndarray, distancesToTree: np.ndarray,
+                    finished: np.ndarray, worldVersions: np.ndarray, i: int, action: np.ndarray,
+                    rewardWeights: np.ndarray, rewardTerms: np.ndarray, eventCounts: np.ndarray) -> float:
+    # Same as TreeChopEnv.step for one not finished world, rewardTerms is set to the terms of the reward,
+    # events of the tick are added to eventCounts
+    targetX, targetY, targetZ = numba_getNextWoodBlock(trees, lowestWood, (position[0], position[1], position[2]))
+
+    # 1.1. Move
+    if action[2] > 0.5 and numba_playerIsStanding(position, environment):
+        velocity[2] = JUMP_VELOCITY
+
+    if action[1] > 0.5:
+        velocity[0] = WALK_VELOCITY * math.cos(rotation[0])
+        velocity[1] = WALK_VELOCITY * math.sin(rotation[0])
+
+    # 1.2. Look (0.1rad = 5.7°) - discrete actions
+    if action[5] > 0.5: numba_lookUpDown(rotation, rotation[1] + 0.1)
+    if action[6] > 0.5: numba_lookUpDown(rotation, rotation[1] - 0.1)
+    if action[8] > 0.5: numba_lookLeftRight(rotation, rotation[0] + 0.1)
+    if action[7] > 0.5: numba_lookLeftRight(rotation, rotation[0] - 0.1)
+
+    # 1.2. Look large (0.2rad = 11.4°) - discrete actions
+    if action[9] > 0.5: numba_lookUpDown(rotation, rotation[1] + 0.2)
+    if action[10] > 0.5: numba_lookUpDown(rotation, rotation[1] - 0.2)
+    if action[12] > 0.5: numba_lookLeftRight(rotation, rotation[0] + 0.2)
+    if action[11] > 0.5: numba_lookLeftRight(rotation, rotation[0] - 0.2)
+
+    # 2. Physics
+    for _ in range(int(1 / DELTA)):  # 0.1*10 = 1tick
+        numba_physicsStep(position, velocity, environment, DELTA)
+
+    # 3. Attack blocks - wrong block destroyed
+    wrongBlockDestroyed = False
+    if action[0] > 0.5:
+        block = numba_attackBlock(environment, woodPerLayer, trees, lowestWood, position, rotation, attackedBlock,
+                                  attackTicksRemaining, i, DELTA)
+        if block:
+            worldVersions[i] += 1
+            eventCounts[EVENT_CHOPPED + block - GROUND] += 1
+        wrongBlockDestroyed = block != 0 and block != WOOD and block != LEAF
+    else:
+        attackedBlock[:] = -1
+        attackTicksRemaining[i] = 0
+
+    # 4. Quantities of the reward terms - game over, looking at wood, moving to the nearest tree
+    head = (position[0], position[1], position[2] + 1)
+    block, x, y, z = numba_getBlockInFront(environment, head, numba_getLookingDirectionVector(rotation),
+                                           BREAKING_RANGE)
+    lookingAtTarget = block != 0 and x == targetX and y == targetY and z == targetZ
+    standing = lookingAtTarget and numba_playerIsStanding(position, environment)
+    if lookingAtTarget:
+        eventCounts[EVENT_TARGET_LOOK_STANDING if standing else EVENT_TARGET_LOOK] += 1
+
+    newDistanceToTree = numba_getDistanceToNearestTree(trees, position)
+    reward, lookingRewards[i], targetReached = numba_computeReward(
+        rewardWeights, rewardTerms, action[1] > 0.5, wrongBlockDestroyed, numba_isGameOver(environment, position),
+        lookingAtTarget, standing, lookingRewards[i], distancesToTree[i] - newDistanceToTree)
+    distancesToTree[i] = newDistanceToTree
+    if targetReached:
+        finished[i] = True
+    return reward
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def numba_batchStep(environments: np.ndarray, woodPerLayers: np.ndarray, trees: np.ndarray, lowestWood: np.ndarray,
+                    positions: np.ndarray, velocities: np.ndarray, rotations: np.ndarray, attackedBlocks: np.ndarray,
+                    attackTicksRemaining: np.ndarray, lookingRewards: np.ndarray, distancesToTree: np.ndarray,
+                    stepsPassed: np.ndarray, finished: np.ndarray, worldVersions: np.ndarray,
+                    actions: np.ndarray, rewardWeights: np.ndarray, maxGameLengthSteps: int, rays: np.ndarray,
+                    observations: np.ndarray, stepRewards: np.ndarray, rewardTerms: np.ndarray, tickTerms: np.ndarray,
+                    dones: np.ndarray, woodLeft: np.ndarray, viewportKeys: np.ndarray, viewportReused: np.ndarray,
+                    actionRepeat: int, eventCounts: np.ndarray):
+    for i in prange(environments.shape[0]):
+        environment = environments[i]
+        # Same action for actionRepeat ticks until the episode is done, only the last tick is observed
+        reward = 0.
+        rewardTerms[i] = 0
+        for _ in range(actionRepeat):
+            if not (finished[i] or numba_isGameOver(environment, positions[i])):
+                reward += numba_worldStep(environment, woodPerLayers[i], trees[i], lowestWood[i], positions[i],
+                                          velocities[i], rotations[i], attackedBlocks[i], attackTicksRemaining,
+                                          lookingRewards, distancesToTree, finished, worldVersions, i, actions[i],
+                                          rewardWeights[i], tickTerms[i], eventCounts[i])
+                rewardTerms[i] += tickTerms[i]
+            stepsPassed[i] += 1
+
+            woodLeft[i] = woodPerLayers[i].sum()
+            dones[i] = (finished[i] or numba_isGameOver(environment, positions[i])
+                        or woodLeft[i] == 0 or stepsPassed[i] >= maxGameLengthSteps)
+            if dones[i]:
+                break
+        stepRewards[i] = reward
+        viewportReused[i] = numba_writeObservation(environment, trees[i], lowestWood[i], positions[i], velocities[i],
+                                                   rotations[i], rays, observations[i], viewportKeys[i],
+                                                   worldVersions[i])
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def numba_batchObservation(environments: np.ndarray, trees: np.ndarray, lowestWood: np.ndarray, positions: np.ndarray,
+                           velocities: np.ndarray, rotations: np.ndarray, rays: np.ndarray, indices: np.ndarray,
+                           observations: np.ndarray, viewportKeys: np.ndarray, worldVersions: np.ndarray):
+    for j in prange(indices.shape[0]):
+        i = indices[j]
+        numba_writeObservation(environments[i], trees[i], lowestWood[i], positions[i], velocities[i], rotations[i],
+                               rays, observations[i], viewportKeys[i], worldVersions[i])
+
+
+##### REST of the CODE #####
+
+def getEpisodeEvents(counts: np.ndarray) -> Dict[str, int]:
+    # Event counts of a world -> {event: count} of the events that happened, same as EpisodeEvents.getCounts()
+    return {event: int(count) for event, count in zip(EPISODE_EVENTS, counts) if count}
+
+
+class BatchedTreeChop:
+    """
+    N TreeChop worlds stepped together by a single numba call.
+    Worlds are one (N, z, y, x) uint8 array, player state is kept as arrays of (N, 3) / (N, 2).
+    Steps like DummyVecEnv([TreeChopEnv, ...]) with automatic reset of finished worlds.
+
+    Does not import stable-baselines (and so tensorflow) nor gym until the spaces are used, worker processes can use
+    it directly. BatchedTreeChopEnv wraps it into the VecEnv interface.
+    """
+
+    def __init__(self, numEnvs: int, maxGameLengthSteps: int = 50, endAfterOneBlock: bool = True,
+                 fixedTreeHeight: int = None, worldShape: Vec3 = WORLD_SHAPE, treeCount: int = 1,
+                 worldPool: WorldPool = None, viewportResX: int = VIEWPORT_RES_X, viewportResY: int = VIEWPORT_RES_Y,
+                 viewportFov: float = VIEWPORT_FOV, foveatedViewport: bool = False, viewportCache: bool = True,
+                 profile: bool = False, rewardWeights: Union[RewardWeights, List[RewardWeights]] = None,
+                 actionRepeat: int = 1):
+        self.numEnvs = numEnvs
+        self.profiler = StepProfiler(profile)  # Phases of step() - numba step, resets of finished worlds
+        self.observationShape = (getObservationsCount(viewportResX, viewportResY),)
+        self.actionShape = (getActionsCount(),)
+        self._observationSpace = self._actionSpace = None  # Created on first use, workers only need the shapes
+        self.setup = {
+            "max_game_length_steps": maxGameLengthSteps,
+            "end_after_one_block": endAfterOneBlock,
+            "fixed_tree_height": fixedTreeHeight,
+            "world_shape": worldShape,
+            "tree_count": treeCount
+        }
+
+        # All worlds are generated (or picked from the pool) by this generator, seed() makes them reproducible
+        self.random = np.random.default_rng()
+
+        # Finished worlds are copied from the pool instead of creating a new Game
+        self.worldPool = worldPool
+        if worldPool is not None:
+            worldPool.check(worldShape, treeCount, fixedTreeHeight)
+
+        # World and player state
+        self.environments = np.zeros((numEnvs, worldShape.z, worldShape.y, worldShape.x), dtype=np.uint8)
+        self.woodPerLayers = np.zeros((numEnvs, worldShape.z), dtype=np.int64)  # Updated when wood is destroyed
+        self.trees = np.zeros((numEnvs, treeCount, 2), dtype=np.int64)  # Same as Game.trees
+        self.lowestWood = np.zeros((numEnvs, treeCount), dtype=np.int64)  # Same as Game.lowestWood
+        self.positions = np.zeros((numEnvs, 3), dtype=np.float64)
+        self.velocities = np.zeros((numEnvs, 3), dtype=np.float64)
+        self.rotations = np.zeros((numEnvs, 2), dtype=np.float64)  # (leftRight, upDown)
+
+        # Attack state
+        self.attackedBlocks = np.full((numEnvs, 3), -1, dtype=np.int64)
+        self.attackTicksRemaining = np.zeros(numEnvs, dtype=np.float64)
+
+        # Episode state
+        self.lookingRewards = np.zeros(numEnvs, dtype=np.float64)
+        self.distancesToTree = np.zeros(numEnvs, dtype=np.float64)
+        self.stepsPassed = np.zeros(numEnvs, dtype=np.int64)
+        self.finished = np.zeros(numEnvs, dtype=np.bool_)
+        self.worldVersions = np.zeros(numEnvs, dtype=np.int64)  # Changes with every destroyed block and reset
+
+        # Viewport cache, same as TreeChopEnv - the viewport stays in the observation row while its key matches
+        self.viewportCache = viewportCache
+        self.viewportKeys = np.full((numEnvs, VIEWPORT_KEY_SIZE), np.nan)
+        self.viewportReused = np.zeros(numEnvs, dtype=np.bool_)
+        self.viewportCacheHits = 0
+        self.viewportCacheMisses = 0
+
+        # Step outputs
+        self.observations = np.zeros((numEnvs,) + self.observationShape, dtype=np.float32)
+        self.rewards = np.zeros(numEnvs, dtype=np.float32)
+        self.dones = np.zeros(numEnvs, dtype=np.bool_)
+        self.rewardTerms = np.zeros((numEnvs, len(REWARD_TERMS)), dtype=np.float64)  # info["reward_terms"]
+        self.tickTerms = np.zeros((numEnvs, len(REWARD_TERMS)), dtype=np.float64)
+        self.woodLeft = np.zeros(numEnvs, dtype=np.int64)
+        self.eventCounts = np.zeros((numEnvs, len(EPISODE_EVENTS)), dtype=np.int64)  # info["episode_events"]
+
+        # Weights of the reward terms - the same for all worlds (REWARDS when None) or one RewardWeights per world
+        self.rewardWeights = getRewardWeightsArray(rewardWeights, numEnvs)
+
+        # Ticks every action is repeated for inside the numba step (physics, attack and reward of each), summed
+        # reward and one observation per step. max_game_length_steps still counts ticks
+        self.actionRepeat = actionRepeat
+
+        self.actions = np.zeros((numEnvs,) + self.actionShape, dtype=np.float32)
+        self.rays = getViewportRays(viewportResX, viewportResY, viewportFov, foveatedViewport)
+
+    def reset(self) -> np.ndarray:
+        for i in range(self.numEnvs):
+            self._resetWorld(i)
+        numba_batchObservation(self.environments, self.trees, self.lowestWood, self.positions, self.velocities,
+                               self.rotations, self.rays, np.arange(self.numEnvs), self.observations,
+                               self.viewportKeys, self.worldVersions)
+        return self.observations.copy()
+
+    def seed(self, seed: int = None) -> List[int]:
+        self.random = np.random.default_rng(seed)
+        return [seed]
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[dict]]:
+        infos = self.stepInPlace(actions)
+        return self.observations.copy(), self.rewards.copy(), self.dones.copy(), infos
+
+    def stepInPlace(self, actions: np.ndarray, terminalObservations: np.ndarray = None) -> List[dict]:
+        # step() without copies - results stay in self.observations, rewards and dones until the next step.
+        # Terminal observations go to the rows of terminalObservations when given, to the infos otherwise
+        self.actions[:] = actions
+        if not self.viewportCache:
+            self.viewportKeys[:] = np.nan
+        with self.profiler.phase("batch_step"):
+            numba_batchStep(self.environments, self.woodPerLayers, self.trees, self.lowestWood, self.positions,
+                            self.velocities, self.rotations,
+                            self.attackedBlocks, self.attackTicksRemaining, self.lookingRewards,
+                            self.distancesToTree, self.stepsPassed, self.finished, self.worldVersions,
+                            self.actions, self.rewardWeights, self.setup["max_game_length_steps"], self.rays,
+                            self.observations, self.rewards, self.rewardTerms, self.tickTerms, self.dones,
+                            self.woodLeft, self.viewportKeys, self.viewportReused, self.actionRepeat,
+                            self.eventCounts)
+        reused = int(np.count_nonzero(self.viewportReused))
+        self.viewportCacheHits += reused
+        self.viewportCacheMisses += self.numEnvs - reused
+
+        infos = [{"wood_left": int(woodLeft), "reward_terms": getRewardTerms(terms)}
+                 for woodLeft, terms in zip(self.woodLeft, self.rewardTerms)]
+        doneIndices = np.flatnonzero(self.dones)
+        if len(doneIndices):
+            with self.profiler.phase("reset"):
+                for i in doneIndices:
+                    infos[i]["episode_events"] = getEpisodeEvents(self.eventCounts[i])
+                    if terminalObservations is None:
+                        infos[i]["terminal_observation"] = self.observations[i].copy()
+                    else:
+                        terminalObservations[i] = self.observations[i]
+                    self._resetWorld(i)
+            with self.profiler.phase("reset_observation"):
+                numba_batchObservation(self.environments, self.trees, self.lowestWood, self.positions,
+                                       self.velocities, self.rotations, self.rays, doneIndices, self.observations,
+                                       self.viewportKeys, self.worldVersions)
+        self.profiler.countStep()
+        return infos
+
+    def _resetWorld(self, i: int):
+        if self.worldPool is not None:
+            pool, j = self.worldPool, self.worldPool.sample(self.random)
+            np.copyto(self.environments[i], pool.environments[j])
+            self.woodPerLayers[i] = pool.woodPerLayers[j]
+            self.trees[i] = pool.trees[j]
+            self.lowestWood[i] = pool.lowestWood[j]
+            self.positions[i] = pool.positions[j]
+            self.rotations[i] = pool.rotations[j]
+            self._resetEpisodeState(i, numba_getDistanceToNearestTree(self.trees[i], self.positions[i]))
+        else:
+            self.loadGame(i, createRandomGame(self.random, self.setup["fixed_tree_height"], self.setup["world_shape"],
+                                              self.setup["tree_count"]))
+
+    def loadGame(self, i: int, game: Game):
+        # World i starts a new episode in the game, the game itself is not changed by stepping
+        self.environments[i] = game.environment
+        self.woodPerLayers[i] = game.woodPerLayer
+        self.trees[i] = game.trees
+        self.lowestWood[i] = game.lowestWood
+        self.positions[i] = game.player.position.asTuple()
+        self.rotations[i] = game.player.rotation.x, game.player.rotation.y
+        self._resetEpisodeState(i, game.getPlayerDistanceToTree())
+
+    def _resetEpisodeState(self, i: int, distanceToTree: float):
+        self.velocities[i] = 0
+
+        self.attackedBlocks[i] = -1
+        self.attackTicksRemaining[i] = 0
+
+        self.lookingRewards[i] = 0
+        self.distancesToTree[i] = distanceToTree
+        self.stepsPassed[i] = 0
+        self.finished[i] = False
+        self.worldVersions[i] += 1
+        self.eventCounts[i] = 0
+
+    @property
+    def observation_space(self):
+        if self._observationSpace is None:
+            from gym import spaces
+            self._observationSpace = spaces.Box(low=-1, high=1, shape=self.observationShape, dtype=np.float32)
+        return self._observationSpace
+
+    @property
+    def action_space(self):
+        if self._actionSpace is None:
+            from gym import spaces
+            self._actionSpace = spaces.Box(low=-1, high=1, shape=self.actionShape, dtype=np.float32)
+        return self._actionSpace
+
+    @property
+    def viewportCacheHitRate(self) -> float:
+        # Fraction of step observations which reused the previous viewport
+        observations = self.viewportCacheHits + self.viewportCacheMisses
+        return self.viewportCacheHits / observations if observations else 0.
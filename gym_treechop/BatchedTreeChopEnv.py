@@ -0,0 +1,52 @@
+from typing import List
+
+import numpy as np
+from stable_baselines.common.vec_env import VecEnv
+
+from gym_treechop.BatchedTreeChop import BatchedTreeChop
+
+
+class BatchedTreeChopEnv(VecEnv):
+    """
+    VecEnv of N TreeChop worlds stepped together by a single numba call (see BatchedTreeChop).
+    Behaves like DummyVecEnv([TreeChopEnv, ...]) with automatic reset of finished worlds.
+    """
+
+    def __init__(self, numEnvs: int, **batchKwargs):
+        # batchKwargs are BatchedTreeChop arguments (maxGameLengthSteps, worldPool, viewportResX, ...)
+        self.batch = BatchedTreeChop(numEnvs, **batchKwargs)
+        super().__init__(numEnvs, self.batch.observation_space, self.batch.action_space)
+        self.actions = None
+
+    def reset(self) -> np.ndarray:
+        return self.batch.reset()
+
+    def step_async(self, actions: np.ndarray):
+        self.actions = actions
+
+    def step_wait(self):
+        return self.batch.step(self.actions)
+
+    def close(self):
+        pass
+
+    def seed(self, seed: int = None):
+        # All worlds are generated by one generator of the batch
+        self.batch.seed(seed)
+        return [seed for _ in range(self.num_envs)]
+
+    def get_attr(self, attr_name: str, indices=None) -> List:
+        return [getattr(self.batch, attr_name) for _ in self._getIndices(indices)]
+
+    def set_attr(self, attr_name: str, value, indices=None):
+        setattr(self.batch, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List:
+        return [getattr(self.batch, method_name)(*method_args, **method_kwargs) for _ in self._getIndices(indices)]
+
+    def _getIndices(self, indices) -> List[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
@@ -0,0 +1,133 @@
+from typing import Iterator, List
+
+import gym
+import numpy as np
+
+from gym_treechop.TreeChopEnv import TreeChopEnv
+
+
+class EpisodeRecorder(gym.Wrapper):
+    """
+    Records the episodes of a TreeChopEnv - the initial world and player pose, then for every step the player pose,
+    changed blocks, action, reward and done. save() writes all episodes into one compressed .npz file,
+    EpisodeRecording loads it and replays the states (gym_treechop.render_recording renders them offline).
+    """
+
+    def __init__(self, env: TreeChopEnv):
+        super().__init__(env)
+        self.episodes: List[dict] = []  # Finished episodes
+        self._startEpisode()
+
+    def reset(self, **kwargs):
+        obs = self.env.reset(**kwargs)
+        self._finishEpisode()
+        self._startEpisode()
+        return obs
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        game = self.env.game
+        episode = self.episode
+
+        # Blocks are compared only when the world changed, most steps do not change any
+        deltas = np.zeros((0, 4), dtype=np.int16)
+        if game.worldVersion != self.worldVersion:
+            changed = np.argwhere(game.environment != self.environment)
+            blocks = game.environment[tuple(changed.T)]
+            self.environment[tuple(changed.T)] = blocks
+            deltas = np.column_stack((changed, blocks)).astype(np.int16)  # (z, y, x, block)
+            self.worldVersion = game.worldVersion
+
+        episode["positions"].append(game.player.position.asTuple())
+        episode["rotations"].append((game.player.rotation.x, game.player.rotation.y))
+        episode["actions"].append(np.array(action, dtype=np.float32))  # Callers may reuse their action array
+        episode["rewards"].append(reward)
+        episode["dones"].append(done)
+        episode["deltas"].append(deltas)
+        return obs, reward, done, info
+
+    def save(self, path: str):
+        # Unfinished episode is saved too, recording continues
+        self.saveAll([self], path)
+
+    @staticmethod
+    def saveAll(recorders: List['EpisodeRecorder'], path: str, unfinished: bool = True):
+        # Episodes of all recorders into one file, eg. of the worlds of a DummyVecEnv
+        episodes = [episode for recorder in recorders for episode in recorder.episodes]
+        if unfinished:
+            episodes += [recorder.episode for recorder in recorders if recorder.episode["actions"]]
+        if not episodes:
+            raise ValueError("No steps were recorded")
+        actionShape = recorders[0].env.action_space.shape
+
+        def joinSteps(name: str, dtype, shape: tuple = ()) -> np.ndarray:
+            steps = [np.asarray(episode[name], dtype=dtype).reshape((-1,) + shape) for episode in episodes]
+            return np.concatenate(steps)
+
+        deltas = [delta for episode in episodes for delta in episode["deltas"]]
+        np.savez_compressed(
+            path,
+            environments=np.stack([episode["environment"] for episode in episodes]),
+            initialPositions=np.array([episode["initialPosition"] for episode in episodes], dtype=np.float64),
+            initialRotations=np.array([episode["initialRotation"] for episode in episodes], dtype=np.float64),
+            steps=np.array([len(episode["actions"]) for episode in episodes], dtype=np.int64),
+            positions=joinSteps("positions", np.float64, (3,)),
+            rotations=joinSteps("rotations", np.float64, (2,)),
+            actions=joinSteps("actions", np.float32, actionShape),
+            rewards=joinSteps("rewards", np.float32),
+            dones=joinSteps("dones", np.bool_),
+            deltaCounts=np.array([len(delta) for delta in deltas], dtype=np.int32),
+            deltas=np.concatenate(deltas),
+        )
+
+    def _startEpisode(self):
+        game = self.env.game
+        self.environment = game.environment.copy()  # Environment after the last recorded step
+        self.worldVersion = game.worldVersion
+        self.episode = {
+            "environment": self.environment.copy(),
+            "initialPosition": game.player.position.asTuple(),
+            "initialRotation": (game.player.rotation.x, game.player.rotation.y),
+            "positions": [], "rotations": [], "actions": [], "rewards": [], "dones": [], "deltas": [],
+        }
+
+    def _finishEpisode(self):
+        if self.episode["actions"]:
+            self.episodes.append(self.episode)
+
+
+class EpisodeRecording:
+    """
+    Episodes written by EpisodeRecorder.save(). Steps of all episodes are concatenated,
+    episode i has steps[i] steps starting at stepStarts[i], changed blocks of step j are deltas[deltaStarts[j]:].
+    """
+    ARRAYS = ("environments", "initialPositions", "initialRotations", "steps", "positions", "rotations", "actions",
+              "rewards", "dones", "deltaCounts", "deltas")
+
+    def __init__(self, arrays: dict):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.stepStarts = np.concatenate(([0], np.cumsum(self.steps)))
+        self.deltaStarts = np.concatenate(([0], np.cumsum(self.deltaCounts)))
+
+    @classmethod
+    def load(cls, path: str) -> 'EpisodeRecording':
+        with np.load(path) as file:
+            return cls({name: file[name] for name in cls.ARRAYS})
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def getReturns(self) -> np.ndarray:
+        # Sum of rewards of each episode
+        return np.add.reduceat(self.rewards.astype(np.float64), self.stepStarts[:-1])
+
+    def iterateStates(self, episode: int) -> Iterator[tuple]:
+        # (environment, position, rotation) of the initial state and after every step, the environment is updated
+        # in place - copy it to keep it
+        environment = self.environments[episode].copy()
+        yield environment, tuple(self.initialPositions[episode]), tuple(self.initialRotations[episode])
+        for step in range(self.stepStarts[episode], self.stepStarts[episode + 1]):
+            deltas = self.deltas[self.deltaStarts[step]:self.deltaStarts[step + 1]]
+            environment[deltas[:, 0], deltas[:, 1], deltas[:, 2]] = deltas[:, 3]
+            yield environment, tuple(self.positions[step]), tuple(self.rotations[step])
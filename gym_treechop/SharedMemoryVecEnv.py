@@ -0,0 +1,132 @@
+import ctypes
+import multiprocessing
+from typing import List
+
+import numpy as np
+from stable_baselines.common.vec_env import VecEnv
+
+from gym_treechop.SharedMemoryWorker import worker, asNumpy
+from gym_treechop.TreeChopEnv import VIEWPORT_RES_X, VIEWPORT_RES_Y, createActionSpace, createObservationSpace
+from gym_treechop.rewards import getRewardWeightsArray
+
+
+def _sharedArray(context, shape: tuple, dtype, ctype):
+    # Returns (raw shared memory, numpy view of it)
+    raw = context.RawArray(ctype, int(np.prod(shape)))
+    return raw, asNumpy(raw, shape, dtype)
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Runs a BatchedTreeChop of envsPerWorker worlds in each of numWorkers processes.
+    Actions, observations, rewards and dones are exchanged thru shared memory, only the small info dicts are pickled.
+    Worlds are ordered by worker: world i is world i % envsPerWorker of worker i // envsPerWorker.
+    """
+
+    def __init__(self, numWorkers: int, envsPerWorker: int = 8, startMethod: str = "spawn", **envKwargs):
+        numEnvs = numWorkers * envsPerWorker
+        observationSpace = createObservationSpace(envKwargs.get("viewportResX", VIEWPORT_RES_X),
+                                                  envKwargs.get("viewportResY", VIEWPORT_RES_Y))
+        super().__init__(numEnvs, observationSpace, createActionSpace())
+        self.numWorkers = numWorkers
+        self.envsPerWorker = envsPerWorker
+        self.closed = False
+
+        # Spawn is the safe default, parent process usually already runs tensorflow threads
+        context = multiprocessing.get_context(startMethod)
+
+        observationShape = (numEnvs,) + self.observation_space.shape
+        actionShape = (numEnvs,) + self.action_space.shape
+        self.buffers = {}
+        self.buffers["observations"], self.observations = _sharedArray(context, observationShape, np.float32,
+                                                                       ctypes.c_float)
+        self.buffers["terminal_observations"], self.terminalObservations = _sharedArray(context, observationShape,
+                                                                                        np.float32, ctypes.c_float)
+        self.buffers["actions"], self.actions = _sharedArray(context, actionShape, np.float32, ctypes.c_float)
+        self.buffers["rewards"], self.rewards = _sharedArray(context, (numEnvs,), np.float32, ctypes.c_float)
+        self.buffers["dones"], self.dones = _sharedArray(context, (numEnvs,), np.bool_, ctypes.c_bool)
+
+        # rewardWeights may be one RewardWeights per world, each worker gets the weights of its worlds
+        rewardWeights = getRewardWeightsArray(envKwargs.pop("rewardWeights", None), numEnvs)
+
+        self.remotes, workRemotes = zip(*[context.Pipe() for _ in range(numWorkers)])
+        self.processes = []
+        for workerIndex, (workRemote, remote) in enumerate(zip(workRemotes, self.remotes)):
+            workerKwargs = dict(envKwargs, rewardWeights=rewardWeights[workerIndex * envsPerWorker:
+                                                                       (workerIndex + 1) * envsPerWorker])
+            args = (workRemote, remote, workerIndex, envsPerWorker, numEnvs, workerKwargs, self.buffers)
+            process = context.Process(target=worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            workRemote.close()
+
+        for remote in self.remotes:
+            remote.recv()  # Wait for the workers to compile numba functions
+
+    def reset(self) -> np.ndarray:
+        for remote in self.remotes:
+            remote.send(("reset", None))
+        for remote in self.remotes:
+            remote.recv()
+        return self.observations.copy()
+
+    def step_async(self, actions: np.ndarray):
+        self.actions[:] = actions
+        for remote in self.remotes:
+            remote.send(("step", None))
+
+    def step_wait(self):
+        infos = []
+        for remote in self.remotes:
+            infos.extend(remote.recv())
+
+        for i in np.flatnonzero(self.dones):
+            infos[i]["terminal_observation"] = self.terminalObservations[i].copy()
+
+        return self.observations.copy(), self.rewards.copy(), self.dones.copy(), infos
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def seed(self, seed: int = None):
+        # Worker i generates its worlds from seed + i
+        seeds = []
+        for workerIndex, remote in enumerate(self.remotes):
+            remote.send(("seed", None if seed is None else seed + workerIndex))
+        for remote in self.remotes:
+            seeds.extend(remote.recv() * self.envsPerWorker)
+        return seeds
+
+    def get_attr(self, attr_name: str, indices=None) -> List:
+        values = []
+        for i in self._getIndices(indices):
+            remote = self.remotes[i // self.envsPerWorker]
+            remote.send(("get_attr", attr_name))
+            values.append(remote.recv())
+        return values
+
+    def set_attr(self, attr_name: str, value, indices=None):
+        for workerIndex in {i // self.envsPerWorker for i in self._getIndices(indices)}:
+            self.remotes[workerIndex].send(("set_attr", (attr_name, value)))
+            self.remotes[workerIndex].recv()
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List:
+        # Method of the BatchedTreeChop is called once per worker, its result is returned for each of the worlds
+        results = {}
+        for workerIndex in {i // self.envsPerWorker for i in self._getIndices(indices)}:
+            self.remotes[workerIndex].send(("env_method", (method_name, method_args, method_kwargs)))
+            results[workerIndex] = self.remotes[workerIndex].recv()
+        return [results[i // self.envsPerWorker] for i in self._getIndices(indices)]
+
+    def _getIndices(self, indices) -> List[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
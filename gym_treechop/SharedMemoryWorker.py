@@ -0,0 +1,68 @@
+# Worker process of SharedMemoryVecEnv. Kept apart from it, so the spawned worker
+# does not import stable-baselines (and tensorflow) when unpickling its target.
+import numba
+import numpy as np
+
+from gym_treechop.BatchedTreeChop import BatchedTreeChop
+from gym_treechop.game.events import logger
+
+
+def asNumpy(raw, shape: tuple, dtype) -> np.ndarray:
+    return np.frombuffer(raw, dtype=dtype).reshape(shape)
+
+
+def worker(remote, parentRemote, workerIndex: int, envsPerWorker: int, numEnvs: int, envKwargs: dict,
+           buffers: dict):
+    parentRemote.close()
+
+    numba.set_num_threads(1)  # One process per core, do not oversubscribe with numba threads
+
+    env = BatchedTreeChop(envsPerWorker, **envKwargs)
+    observationShape = env.observationShape
+    actionShape = env.actionShape
+    worlds = slice(workerIndex * envsPerWorker, (workerIndex + 1) * envsPerWorker)
+
+    observations = asNumpy(buffers["observations"], (numEnvs,) + observationShape, np.float32)[worlds]
+    terminalObservations = asNumpy(buffers["terminal_observations"], (numEnvs,) + observationShape,
+                                   np.float32)[worlds]
+    actions = asNumpy(buffers["actions"], (numEnvs,) + actionShape, np.float32)[worlds]
+    rewards = asNumpy(buffers["rewards"], (numEnvs,), np.float32)[worlds]
+    dones = asNumpy(buffers["dones"], (numEnvs,), np.bool_)[worlds]
+
+    # Pre-warm numba JIT functions, so the first training step is not slowed down by compilation
+    env.reset()
+    env.step(np.zeros((envsPerWorker,) + actionShape, dtype=np.float32))
+    env.reset()
+    observations[:] = env.observations
+    remote.send("ready")
+
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == "step":
+                # Results are copied once, straight from the buffers of the batch into the shared memory
+                infos = env.stepInPlace(actions, terminalObservations)
+                observations[:] = env.observations
+                rewards[:] = env.rewards
+                dones[:] = env.dones
+                remote.send(infos)
+            elif command == "reset":
+                env.reset()
+                observations[:] = env.observations
+                remote.send(None)
+            elif command == "seed":
+                remote.send(env.seed(data))
+            elif command == "get_attr":
+                remote.send(getattr(env, data))
+            elif command == "set_attr":
+                remote.send(setattr(env, data[0], data[1]))
+            elif command == "env_method":
+                method = getattr(env, data[0])
+                remote.send(method(*data[1], **data[2]))
+            elif command == "close":
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(f"Unknown command '{command}'")
+    except KeyboardInterrupt:
+        logger.info("SharedMemoryVecEnv worker %d: got KeyboardInterrupt", workerIndex)
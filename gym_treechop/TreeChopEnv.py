@@ -1,81 +1,122 @@
 import math
-from random import randint
 from typing import List
 
 import gym
 import numpy as np
 from gym import spaces
-from numba import jit
 
-from gym_treechop.game.constants import Blocks
-from gym_treechop.game.game import Game, numba_getBlockDistance
+from gym_treechop.WorldPool import WorldPool
+from gym_treechop.observation import VIEWPORT_RES_X, VIEWPORT_RES_Y, VIEWPORT_FOV, MAX_BLOCK_DISTANCE, \
+    VIEWPORT_KEY_SIZE, OBSERVATION_VIEWPORT_START, getActionsCount, getObservationsCount, getViewportRays, \
+    numba_updateViewportKey, numba_renderViewportParallel
+from gym_treechop.rewards import REWARDS, REWARD_TERMS, RewardWeights, getRewardWeightsArray, getRewardTerms, \
+    numba_computeReward  # REWARDS stays importable from here, where it was defined before
+from gym_treechop.game.constants import Blocks, WORLD_SHAPE, DELTA
+from gym_treechop.game.events import EpisodeEvents
+from gym_treechop.game.game import Game, createRandomGame
 from gym_treechop.game.physiscs import Physics
-from gym_treechop.game.renderer import Renderer
-from gym_treechop.game.structures import Vec3, numba_Vec3Rotate
+from gym_treechop.game.profiler import StepProfiler
+from gym_treechop.game.rasterizer import rasterizeFrame
+from gym_treechop.game.structures import Vec3
 from gym_treechop.game.utils import limit, playerIsStanding
 
+# Game methods timed as their own phase by TreeChopEnv(profile=True)
+PROFILED_GAME_METHODS = ("getNextWoodBlock", "getBlockInFrontOfPlayer", "attackBlock", "getPlayerDistanceToTree")
 
-class REWARDS:
-    # Sweeties
-    LONG_LOOK_AT_TARGET = 100
-    LOOKING_AT_TARGET = 1  # For each tick
-    BEING_CLOSE_TO_TREE = 1  # 0.05  # For closer each block closer to the center ???
-    MOVE_REWARD = 0.01  # This will encourage Mike to move
 
-    # Deprecated sweeties
-    WOOD_CHOPPED = 0  # 1_000
-    WOOD_CHOPPING_PER_TICK = 0  # 2  # Up to reward x*10 = 20 ???
+def createActionSpace() -> spaces.Box:
+    return spaces.Box(low=-1, high=1, shape=(getActionsCount(),), dtype=np.float32)
 
-    CHOPPING_REWARD = 0  # 0.02  # This will encourage Mike to chop
 
-    # Punishments
-    TICK_PASSED = -0.04
-    WRONG_BLOCK_DESTROYED = -5
-    DIED = 0  # -1_000  # -10_000
+def createObservationSpace(viewportResX: int = VIEWPORT_RES_X, viewportResY: int = VIEWPORT_RES_Y) -> spaces.Box:
+    return spaces.Box(low=-1, high=1, shape=(getObservationsCount(viewportResX, viewportResY),), dtype=np.float32)
 
 
-DELTA = 0.1
+def createDictObservationSpace(viewportResX: int = VIEWPORT_RES_X, viewportResY: int = VIEWPORT_RES_Y) -> spaces.Dict:
+    # Same values as createObservationSpace, viewport as an image for CNN policies (0 = far away, 255 = close)
+    return spaces.Dict({
+        "scalars": spaces.Box(low=-1, high=1, shape=(OBSERVATION_VIEWPORT_START,), dtype=np.float32),
+        "viewport": spaces.Box(low=0, high=255, shape=(viewportResY, viewportResX, 1), dtype=np.uint8),
+    })
 
 
 class TreeChopEnv(gym.Env):
-    metadata = {'render.modes': ['human']}
-
-    def __init__(self, maxGameLengthSteps: int = 50, endAfterOneBlock: bool = True, fixedTreeHeight: int = None):
-        self.game = Game()
+    metadata = {'render.modes': ['human', 'rgb_array']}
+
+    def __init__(self, maxGameLengthSteps: int = 50, endAfterOneBlock: bool = True, fixedTreeHeight: int = None,
+                 worldShape: Vec3 = WORLD_SHAPE, treeCount: int = 1, worldPool: WorldPool = None,
+                 observationView: bool = False, dictObservation: bool = False, viewportResX: int = VIEWPORT_RES_X,
+                 viewportResY: int = VIEWPORT_RES_Y, viewportFov: float = VIEWPORT_FOV, foveatedViewport: bool = False,
+                 viewportCache: bool = True, profile: bool = False, rewardWeights: RewardWeights = None,
+                 actionRepeat: int = 1):
+        # Phases of step() with profile, self.profiler.dump() / getSummary() - disabled it only returns a no-op phase
+        self.profiler = StepProfiler(profile)
+
+        # Chopped blocks and looks at the target of the episode, info["episode_events"] of its last step
+        self.events = EpisodeEvents()
+
+        # Every world and spawn of this env comes from its own generator, seed() makes the episodes reproducible
+        self.random = np.random.default_rng()
+        self.game = Game(worldShape=worldShape, treeCount=treeCount, random=self.random)
+        self.profiler.instrument(self.game, PROFILED_GAME_METHODS)
         self.renderer = None
 
+        # reset() copies a pre-generated world from the pool instead of creating a new Game
+        self.worldPool = worldPool
+        if worldPool is not None:
+            worldPool.check(worldShape, treeCount, fixedTreeHeight)
+
         self.setup = {
             "max_game_length_steps": maxGameLengthSteps,
             "end_after_one_block": endAfterOneBlock,
-            "fixed_tree_height": fixedTreeHeight
+            "fixed_tree_height": fixedTreeHeight,
+            "world_shape": worldShape,
+            "tree_count": treeCount
         }
         self.state = self._getDefaultState()  # Must be after self.game initialization!
 
-        # Action Space
-        action_attack = 1  # Attack (-1; 1) - Attacks if 0.5+
-        action_forward = 1  # Forward (-1; 1) - Forward if 0.5+
-        action_jump = 1  # Jump (-1; 1) - Jumps if 0.5+
-        action_move_left_right = 2  # Left/Right (-1; 1) - Left/Right if 0.5+
-        action_rotation_small = 4  # Rotation of 5°  X(left/right) ,Y( (-1; 1) - upDown 0-1PI, leftRight 0-2PI
-        action_rotation_large = 4  # Rotation of 10° X(left/right) ,Y( (-1; 1) - upDown 0-1PI, leftRight 0-2PI
-        actions_count = action_attack + action_forward + action_jump \
-                        + action_move_left_right + action_rotation_small + action_rotation_large
-        self.action_space = spaces.Box(low=-1, high=1, shape=(actions_count,), dtype=np.float32)
-
-        # Observation Space
-        player_velocity_upDown = 1
-        distance_to_block_to_destroy = 1
-        rotation_to_block_to_destroy = 2
-        looking_at = 2  # block with penalty for destroy / no penalty for destroy
-        viewport = VIEWPORT_RES_X * VIEWPORT_RES_Y  # Distance to blocks in front of Mike 64x64 - 128° field of view -> 1 point / 2°
-
-        observations_count = player_velocity_upDown \
-                             + distance_to_block_to_destroy + rotation_to_block_to_destroy \
-                             + looking_at + viewport
-        self.observation_space = spaces.Box(low=-1, high=1, shape=(observations_count,), dtype=np.float32)
-
+        # Weights of the reward terms (REWARDS when created without them), info["reward_terms"] has the terms of a step
+        self.rewardWeights = getRewardWeightsArray(rewardWeights, 1)[0]
+        self.rewardTerms = np.zeros(len(REWARD_TERMS), dtype=np.float64)
+        self.tickTerms = np.zeros(len(REWARD_TERMS), dtype=np.float64)
+
+        # Ticks every action is repeated for, step() returns their summed reward and one observation.
+        # max_game_length_steps still counts ticks
+        self.actionRepeat = actionRepeat
+
+        self.action_space = createActionSpace()
+        if dictObservation:
+            self.observation_space = createDictObservationSpace(viewportResX, viewportResY)
+        else:
+            self.observation_space = createObservationSpace(viewportResX, viewportResY)
+
+        # Rays of the viewport pixels, relative to the looking direction
+        self.rays = getViewportRays(viewportResX, viewportResY, viewportFov, foveatedViewport)
+
+        # Every observation is written into this buffer, with observationView step() and reset() return the buffer
+        # itself (no copy) - it is overwritten by the next step
+        self.observation = np.zeros(createObservationSpace(viewportResX, viewportResY).shape, dtype=np.float32)
+        self.viewport = self.observation[OBSERVATION_VIEWPORT_START:].reshape(viewportResY, viewportResX)
+        self.observationView = observationView
+
+        # dictObservation -> {"scalars": first 6 values of the flat observation, "viewport": uint8 image}
+        self.dictObservation = dictObservation
+        self.viewportImage = np.zeros((viewportResY, viewportResX, 1), dtype=np.uint8)
+
+        # Key of the viewport in the observation buffer, NaN never matches. Without viewportCache every viewport
+        # is rendered
+        self.viewportCache = viewportCache
+        self.viewportKey = np.full(VIEWPORT_KEY_SIZE, np.nan)
+        self.viewportCacheHits = 0
+        self.viewportCacheMisses = 0
 
     def step(self, action: List[float]):
+        with self.profiler.phase("step"):
+            result = self._step(action)
+        self.profiler.countStep()
+        return result
+
+    def _step(self, action: List[float]):
         actions = {
             "attack": action[0] > 0.5,
             "forward": action[1] > 0.5,
@@ -91,9 +132,27 @@ class TreeChopEnv(gym.Env):
             "rotation-left-large": action[11],
             "rotation-right-large": action[12],
         }
+        # Same action for actionRepeat ticks, until the episode is done
+        reward = 0.
+        self.rewardTerms[:] = 0
+        for tick in range(self.actionRepeat):
+            reward += self._tick(actions)
+            if self._isDone():
+                break
+
+        info = {"wood_left": self.game.getWoodLeft(), "reward_terms": getRewardTerms(self.rewardTerms), "self": self}
+        with self.profiler.phase("observation"):
+            obs = self._getObservation()
+        done = self._isDone()
+        if done:
+            info["episode_events"] = self.events.getCounts()
+        return obs, reward, done, info
+
+    def _tick(self, actions: dict) -> float:
+        # One tick (1 second of game time) of the game, returns its reward
         targetBlockPosition = self.game.getNextWoodBlock()
 
-        reward = 0
+        reward = 0.
         if not self._isDone():
             # 1.1. Move
             if actions["jump"]:
@@ -101,7 +160,6 @@ class TreeChopEnv(gym.Env):
 
             if actions["forward"]:
                 self.game.forward()
-                reward += REWARDS.MOVE_REWARD
 
             # # 1.2. Look (0.1rad = 5.7°) - discrete actions
             if actions["rotation-up"] > 0.5: self.game.lookUpDown(self.game.player.rotation.y + 0.1)
@@ -120,145 +178,155 @@ class TreeChopEnv(gym.Env):
             # self.game.player.rotation.x = (actions["rotation-left-right"] + 1) * math.pi  # -1 - 1 -> 0-2 -> 0-2PI
 
             # 2. Physics
-            for i in range(int(1 / DELTA)):  # 0.1*10 = 1tick
-                Physics.step(self.game, DELTA)
+            with self.profiler.phase("physics"):
+                Physics.steps(self.game, DELTA, int(1 / DELTA))  # 0.1*10 = 1tick
 
-            # 3. Attack blocks | REWARD +- wood chopped, wrong block destroyed
+            # 3. Attack blocks - wrong block destroyed
+            wrongBlockDestroyed = False
             if actions["attack"]:
                 block = self.game.attackBlock(DELTA)
                 if block:
-                    print(f"Chopped: {Blocks.toName(block)}")
-                    if block == Blocks.WOOD:
-                        pass
-                    elif block == Blocks.LEAF:
-                        pass
-                    else:
-                        reward += REWARDS.WRONG_BLOCK_DESTROYED
+                    self.events.add(f"chopped_{Blocks.toName(block)}")
+                    wrongBlockDestroyed = block != Blocks.WOOD and block != Blocks.LEAF
             else:
                 self.game.stopBlockAttack()
 
-            # 4.1. REWARD - game over
-            if self.game.isGameOver():
-                reward += REWARDS.DIED
-
-            # 4.2. REWARD +- looking at wood, chopping wood
+            # 4. Quantities of the reward terms - game over, looking at wood, moving to the nearest tree
             block, blockPosition = self.game.getBlockInFrontOfPlayer()
-            # if block:
-            #     print("Looking at: ", Blocks.toName(block))
-
-            if blockPosition == targetBlockPosition:
-                if playerIsStanding(self.game.player.position, self.game.environment):
-                    self.state["done"] = True
-                    reward += REWARDS.LONG_LOOK_AT_TARGET
-                    # DO NOT encourage him to jump just to get more sweeties.
-                    reward -= self.state["looking_reward"]
-                    self.state["looking_reward"] = 0
-                    print("SUCCESS Block Look standing!")
-                else:
-                    print("Block Look!")
-                    reward += REWARDS.LOOKING_AT_TARGET
-                    self.state["looking_reward"] += REWARDS.LOOKING_AT_TARGET
-            else:
-                # DO NOT encourage him to look away and then back again to get more sweeties.
-                reward -= self.state["looking_reward"]
-                self.state["looking_reward"] = 0
+            lookingAtTarget = blockPosition == targetBlockPosition
+            standing = lookingAtTarget and playerIsStanding(self.game.player.position, self.game.environment)
+            if lookingAtTarget:
+                self.events.add("target_look_standing" if standing else "target_look")
 
             if block:
-                # print("Look: ", Blocks.toName(block))
                 self.state["latest_look_block_pos"] = blockPosition
 
-            # 4.3. REWARD + moving to the center
-            newDistanceToCenter = self.game.getPlayerDistanceToCenter()
-            distanceChange = self.state["center"] - newDistanceToCenter
-            reward += (distanceChange * REWARDS.BEING_CLOSE_TO_TREE)
-
-            self.state["center"] = newDistanceToCenter
-
-            # 4.4. REWARD - time passes
-            reward += REWARDS.TICK_PASSED
-
-        # print("Obs: ", obs.tolist())
-        # if done:
-        #     print("DONE")
+            newDistanceToTree = self.game.getPlayerDistanceToTree()
+            reward, self.state["looking_reward"], targetReached = numba_computeReward(
+                self.rewardWeights, self.tickTerms, actions["forward"], wrongBlockDestroyed,
+                self.game.isGameOver(), lookingAtTarget, standing, self.state["looking_reward"],
+                self.state["distance_to_tree"] - newDistanceToTree)
+            self.state["distance_to_tree"] = newDistanceToTree
+            if targetReached:
+                self.state["done"] = True
+            self.rewardTerms += self.tickTerms
 
         self.state["steps_passed"] += 1
+        return reward
 
-        info = {"wood_left": self.game.getWoodLeft(), "self": self}
-        obs = self._getObservation()
-        done = self._isDone()
-        return obs, reward, done, info
+    def seed(self, seed: int = None) -> List[int]:
+        # Worlds created by the next reset() follow the seed, with a world pool also the picked worlds
+        self.random = np.random.default_rng(seed)
+        self.action_space.seed(seed)
+        return [seed]
 
     def sample(self):
         return self.action_space.sample()
 
     def reset(self):
-        del self.game
-        # Create new game, tree has 1-6 lock remaining
-        self.game = Game(tree_blocks_to_generate=self.setup["fixed_tree_height"] or randint(1, 6))
+        with self.profiler.phase("reset"):
+            if self.worldPool is not None:
+                self.game.loadWorld(self.worldPool, self.worldPool.sample(self.random))
+            else:
+                del self.game
+                self.game = createRandomGame(self.random, self.setup["fixed_tree_height"], self.setup["world_shape"],
+                                             self.setup["tree_count"])
+                self.profiler.instrument(self.game, PROFILED_GAME_METHODS)
+        self.viewportKey[:] = np.nan
+        self.events.endEpisode()
 
         self.state = self._getDefaultState()
         return self._getObservation()
 
     def render(self, mode='human', close=False):
+        if mode == 'rgb_array':
+            # Headless - top and side view of the world as an image, no vpython canvas is created
+            return rasterizeFrame(self.game)
+
         if not self.renderer:
-            self.renderer = Renderer()
+            from gym_treechop.game.renderer import Renderer  # vpython only when a window is rendered
+            self.renderer = Renderer(self.game.worldShape)
 
         self.renderer.render(self.game)
 
     def close(self):
-        self.renderer.canvas.delete()
-        self.renderer = None
+        if self.renderer:
+            self.renderer.canvas.delete()
+            self.renderer = None
 
-    def _getObservation(self):
-        obs = np.array([])  # self.game.getEnvironmentOneHotEncoded().flatten()
+    def _getObservation(self) -> np.ndarray:
+        obs = self.observation  # self.game.getEnvironmentOneHotEncoded().flatten()
 
         # player_velocity_upDown - only up/down
-        obs = np.append(obs, self.game.player.velocity.z / 3.92)  # Terminal velocity = 3.92 -> -1 - 1
+        obs[0] = self.game.player.velocity.z / 3.92  # Terminal velocity = 3.92 -> -1 - 1
 
         # distance_to_block_to_destroy
         blockToDestroy = self.game.getNextWoodBlock()
         distanceToBlock = self.game.player.getHeadPosition().getLengthTo(blockToDestroy)
-        obs = np.append(obs, limit(distanceToBlock / 5, 0, 1))
+        obs[1] = limit(distanceToBlock / 5, 0, 1)
 
         # rotation_to_block_to_destroy - leftRight -> -1PI - 1PI -> -1 - 1
         b = blockToDestroy.x + 0.5 - self.game.player.getHeadPosition().x
         a = blockToDestroy.y + 0.5 - self.game.player.getHeadPosition().y
-        leftRight = math.atan(b / a) - math.pi / 2  # angle beta is by the block (viz. looking_angle.png)
+        # angle beta is by the block (viz. looking_angle.png), straight to the side when a is 0
+        leftRight = (math.atan(b / a) if a else math.copysign(math.pi / 2, b)) - math.pi / 2
         if a < 0:
             leftRight += math.pi
         leftRight = -leftRight
         # print(f"leftRight: {leftRight/math.pi*180}")
-        obs = np.append(obs, leftRight / math.pi)
+        obs[2] = leftRight / math.pi
 
         # rotation_to_block_to_destroy - upDown -> -0.5PI - 0.5PI -> -1 - 1
         c = distanceToBlock
         b = limit(blockToDestroy.z + 0.5 - self.game.player.getHeadPosition().z, -c, c)
         upDown = math.asin(b / c)
         # print(f"upDown: {upDown/math.pi*180}")
-        obs = np.append(obs, upDown / (math.pi / 2))
+        obs[3] = upDown / (math.pi / 2)
 
         # looking_at [ground, wood, leaf]
         lookingBlock, blockPos = self.game.getBlockInFrontOfPlayer()
-        obs = np.append(obs, 1 if lookingBlock == Blocks.GROUND else 0)  # Penalty for destroy
-        obs = np.append(obs, 1 if lookingBlock == Blocks.LEAF or lookingBlock == Blocks.WOOD else 0)  # No penalty
+        obs[4] = 1 if lookingBlock == Blocks.GROUND else 0  # Penalty for destroy
+        obs[5] = 1 if lookingBlock == Blocks.LEAF or lookingBlock == Blocks.WOOD else 0  # No penalty
 
         # viewport - Distance to blocks in front of Mike 64x64 - 128° field of view -> 1point/2°x2°, max block dis.=8
-        lookingVector = self.game.player.getLookingDirectionVector()
-        viewport = numba_getViewport(lookingVector.asTuple(), self.game.environment,
-                                     self.game.player.position.asTuple())
-
-        viewport = np.array(viewport).flatten()
-        obs = np.append(obs, viewport)
+        playerPos = self.game.player.position.asTuple()
+        rotation = (self.game.player.rotation.x, self.game.player.rotation.y)
+        if not self.viewportCache:
+            self.viewportKey[:] = np.nan
+        if numba_updateViewportKey(self.viewportKey, playerPos, rotation, self.game.worldVersion):
+            self.viewportCacheHits += 1  # Same viewport as in the previous observation, it is still in the buffer
+        else:
+            self.viewportCacheMisses += 1
+            lookingVector = self.game.player.getLookingDirectionVector()
+            numba_renderViewportParallel(lookingVector.asTuple(), self.game.environment, playerPos, self.rays,
+                                         self.viewport)
 
         # Clip everything in range -1 to 1
-        return obs.clip(-1, 1)
+        np.clip(obs, -1, 1, out=obs)
+        if self.dictObservation:
+            return self._getDictObservation()
+        return obs if self.observationView else obs.copy()
+
+    @property
+    def viewportCacheHitRate(self) -> float:
+        # Fraction of observations which reused the previous viewport
+        observations = self.viewportCacheHits + self.viewportCacheMisses
+        return self.viewportCacheHits / observations if observations else 0.
+
+    def _getDictObservation(self) -> dict:
+        # Viewport 0-1 -> 0-255, 1/8 of the memory of the float32 viewport
+        self.viewportImage[:, :, 0] = np.rint(self.viewport * 255)
+        scalars = self.observation[:OBSERVATION_VIEWPORT_START]
+        if self.observationView:
+            return {"scalars": scalars, "viewport": self.viewportImage}
+        return {"scalars": scalars.copy(), "viewport": self.viewportImage.copy()}
 
     def _getDefaultState(self):
         return {
-            "center": self.game.getPlayerDistanceToCenter(),
+            "distance_to_tree": self.game.getPlayerDistanceToTree(),
             "look": False,
             "chopping_reward": 0,
-            "looking_reward": 0,
+            "looking_reward": 0.,
             "steps_passed": 0,
             "latest_look_block_pos": None,
             "to_destroy": Vec3(4, 4, 1),
@@ -270,30 +338,3 @@ class TreeChopEnv(gym.Env):
                or self.game.isGameOver() \
                or self.game.getWoodLeft() == 0 \
                or self.state["steps_passed"] >= self.setup["max_game_length_steps"]
-
-
-VIEWPORT_RES_X = 64
-VIEWPORT_RES_Y = 64
-VIEWPORT_FOV = 128 / 180 * math.pi  # 128° in radians
-MAX_BLOCK_DISTANCE = 8
-
-
-@jit(nopython=True)
-def numba_getViewport(lookingVector: (float, float, float),
-                      environment: np.ndarray,
-                      playerPos: (float, float, float)) -> np.ndarray:
-    viewport = np.empty((VIEWPORT_RES_Y, VIEWPORT_RES_X))
-    for yIndex in range(VIEWPORT_RES_Y):
-        y = yIndex - VIEWPORT_RES_Y / 2  # Convert to be from -ymax/2 to +ymax/2
-        y = y / (VIEWPORT_RES_Y / 2) * VIEWPORT_FOV  # Convert to degrees offset from center
-        for xIndex in range(VIEWPORT_RES_X):
-            x = xIndex - VIEWPORT_RES_X / 2  # Convert to be from -xmax/2 to +xmax/2
-            x = x / (VIEWPORT_RES_X / 2) * VIEWPORT_FOV  # Convert to degrees offset from center
-
-            pointingVector = numba_Vec3Rotate(lookingVector, y, x)
-            blockDistance = numba_getBlockDistance(playerPos, pointingVector, MAX_BLOCK_DISTANCE, environment)
-            blockClose = MAX_BLOCK_DISTANCE - blockDistance  # 8 = Right in front of player -> 0 = Far away
-            finalDistance = ((blockClose / 2) ** 2)  # Block distance close=4^2=16 ->0,.25,1,2.25,4,6.25,9,12.5,16 ->/16
-            viewport[yIndex][xIndex] = finalDistance
-
-    return viewport
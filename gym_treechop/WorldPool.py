@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from gym_treechop.game.constants import WORLD_SHAPE
+from gym_treechop.game.game import createRandomGame
+from gym_treechop.game.structures import Vec3
+
+
+class WorldPool:
+    """
+    Pre-generated initial worlds, reset() of TreeChopEnv / BatchedTreeChop copies one in instead of generating it.
+    All worlds have the same worldShape and treeCount, each tree has fixedTreeHeight wood blocks (1-6 when None).
+    Every array is contiguous with the world index first, load() memory-maps them from a directory written by save().
+    """
+    ARRAYS = ("environments", "positions", "rotations", "trees", "lowestWood", "blockCounts", "woodPerLayers",
+              "chunks")
+    SETUP_FILE = "pool.json"
+
+    def __init__(self, arrays: dict, fixedTreeHeight: int = None, path: Path = None):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.fixedTreeHeight = fixedTreeHeight
+        self.path = path  # Set when memory-mapped, pickling sends only the path then
+        z, y, x = self.environments.shape[1:]
+        self.worldShape = Vec3(x, y, z)
+        self.treeCount = self.trees.shape[1]
+
+    @classmethod
+    def generate(cls, size: int, fixedTreeHeight: int = None, worldShape: Vec3 = WORLD_SHAPE, treeCount: int = 1,
+                 seed: int = None) -> 'WorldPool':
+        # Same seed -> same worlds
+        random = np.random.default_rng(seed)
+        arrays = {}
+        for i in range(size):
+            game = createRandomGame(random, fixedTreeHeight, worldShape, treeCount)
+            world = {
+                "environments": game.environment,
+                "positions": game.player.position.asTuple(),
+                "rotations": (game.player.rotation.x, game.player.rotation.y),
+                "trees": game.trees,
+                "lowestWood": game.lowestWood,
+                "blockCounts": game.blockCounts,
+                "woodPerLayers": game.woodPerLayer,
+                "chunks": game.chunks,
+            }
+            for name, value in world.items():
+                value = np.asarray(value)
+                if name not in arrays:
+                    arrays[name] = np.empty((size,) + value.shape, dtype=value.dtype)
+                arrays[name][i] = value
+        return cls(arrays, fixedTreeHeight)
+
+    def save(self, path: str):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(str(path / f"{name}.npy"), getattr(self, name))
+        (path / self.SETUP_FILE).write_text(json.dumps({"fixed_tree_height": self.fixedTreeHeight}))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'WorldPool':
+        path = Path(path)
+        setup = json.loads((path / cls.SETUP_FILE).read_text())
+        arrays = {name: np.load(str(path / f"{name}.npy"), mmap_mode="r" if mmap else None) for name in cls.ARRAYS}
+        return cls(arrays, setup["fixed_tree_height"], path if mmap else None)
+
+    def __reduce__(self):
+        # Worker processes map the same files instead of receiving a copy of every world
+        if self.path is not None:
+            return WorldPool.load, (str(self.path),)
+        return WorldPool, ({name: getattr(self, name) for name in self.ARRAYS}, self.fixedTreeHeight)
+
+    def __len__(self) -> int:
+        return self.environments.shape[0]
+
+    def sample(self, random: np.random.Generator) -> int:
+        return int(random.integers(len(self)))
+
+    def check(self, worldShape: Vec3, treeCount: int, fixedTreeHeight: int = None):
+        # Environment setup has to match the worlds of the pool
+        if (self.worldShape.asTuple() != worldShape.asTuple() or self.treeCount != treeCount
+                or self.fixedTreeHeight != fixedTreeHeight):
+            raise ValueError(f"World pool of {self.worldShape} worlds with {self.treeCount} trees of height "
+                             f"{self.fixedTreeHeight} does not match environment of {worldShape} worlds with "
+                             f"{treeCount} trees of height {fixedTreeHeight}")
@@ -1,148 +1,321 @@
-from random import random
-from time import time
-
-from gym_treechop.TreeChopEnv import TreeChopEnv
+"""
+Benchmark suite - physics, block attack, raycast, viewport, env step, reset, batched step
+(also with action repeat and per viewport resolution, uniform and foveated) and episode replay.
+Every case is warmed up first (numba compilation, caches), then timed in ROUNDS rounds of its iterations.
+Results are statistics of the time per call over the rounds, --json stores them, --compare checks them against
+a stored baseline and exits with 1 when a case got slower than the threshold.
+
+Run: python -m gym_treechop.benchmark [case ...] [--rounds 10] [--json results.json]
+                                     [--compare baseline.json] [--threshold 0.1] [--report profile]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+from time import perf_counter
+from typing import Callable, Dict, Tuple
+
+import numba
+import numpy as np
+
+from gym_treechop.BatchedTreeChop import BatchedTreeChop
+from gym_treechop.TreeChopEnv import TreeChopEnv, VIEWPORT_RES_X
+from gym_treechop.WorldPool import WorldPool
+from gym_treechop.replay import replayEpisodes
 from gym_treechop.game.game import Game
 from gym_treechop.game.physiscs import Physics
-from gym_treechop.game.structures import Vec3
-
-PHYSICS_RUNS = 100_000
-# 100_000 PHYSICS_RUNS took 15-25 seconds on my 7300 HQ laptop before Numba optimizations.
-def benchmark_physics():
-    game = Game()
-    print(f"Running for {PHYSICS_RUNS} ticks.")
-
-    startTime = time()
-    for tick in range(PHYSICS_RUNS):
-        if not tick % 10_000:
-            print(f"Benchmark Physics: {tick}/{PHYSICS_RUNS} - {(tick / PHYSICS_RUNS * 100):.2f}%")
-        Physics.step(game, 0.1)
 
-    elapsed = time() - startTime
-    print(f"Physics - {elapsed} seconds")
+ROUNDS = 10
+WARMUP_FRACTION = 0.2  # Warm-up calls are 20% of the iterations of one round (at least 1), never timed
+REGRESSION_THRESHOLD = 0.1  # --compare flags cases more than 10% slower than the baseline
+COMPARED_STAT = "min"  # Least affected by other processes on the machine
 
+BATCHED_WORLDS = 64
+ACTIONS_COUNT = 1_000  # Pre-sampled random actions, cycled thru
+WORLD_POOL_SIZE = 100
+REPLAY_STEPS = 50
+ACTION_REPEAT = 4  # Ticks per step of batched_step_repeat
+# Square viewports of batched_step_viewport_* - foveated 32x32 has the center resolution of uniform 64x64
+# with 1/4 of the rays
+VIEWPORT_RESOLUTIONS = [16, 24, 32, 48, 64]
+SEED = 0
 
-BLOCK_ATTACK_RUNS = 100_000
-# 100_000 BLOCK_ATTACK_RUNS took about 4-30 seconds on my 7300 HQ laptop before Numba optimizations.
-def benchmark_blockAttack():
-    game = Game()
-    print(f"Running for {BLOCK_ATTACK_RUNS} runs.")
 
-    startTime = time()
-    for tick in range(BLOCK_ATTACK_RUNS):
-        if not tick % 10_000:
-            print(f"Benchmark Block attack: {tick}/{BLOCK_ATTACK_RUNS} - {(tick / BLOCK_ATTACK_RUNS * 100):.2f}%")
-        game.attackBlock(0.1)
+##### CASES #####
+# Each setup returns the timed function, called without arguments. Worlds and actions are seeded with SEED,
+# so every run times the same work
 
-    elapsed = time() - startTime
-    print(f"Block attack - {elapsed} seconds")
+def setupPhysics() -> Callable[[], None]:
+    game = Game(seed=SEED)
 
+    def run():
+        Physics.step(game, 0.1)
 
-TREE_CHOP_ENV_RUNS = 10_000
+    return run
 
 
-# 100_000 TREE_CHOP_ENV_RUNS took about 125 seconds on my 7300 HQ laptop before Numba optimizations.
-# OLD:                  10_000/ 40s -> 250 steps/s
-# NEW (1.1.2020):   -> 100_000/125s -> 800 steps/s
-# With 64x64 viewport:  10_000/ 59s -> 168 steps/s
-def benchmark_TreeChopEnv():
-    env = TreeChopEnv()
+def setupBlockAttack() -> Callable[[], None]:
+    # Player looks down at the ground, destroyed blocks are placed back
+    game = Game(seed=SEED)
+    game.lookUpDown(0)
 
-    # Prepare numba JIT function
-    action = env.action_space.sample()
-    obs, rewards, done, info = env.step(action)
+    def run():
+        game.invalidateQueryCache()  # Player moves between the attacks of a step, the lookup is not cached
+        coords = game.attackedBlockCoords
+        block = game.attackBlock(0.1)
+        if block:
+            game._setBlock(coords, block)
 
-    # Run
-    print(f"Running for {TREE_CHOP_ENV_RUNS} runs.")
-    startTime = time()
-    for tick in range(TREE_CHOP_ENV_RUNS):
-        if not tick % 10_000:
-            print(
-                f"Benchmark TreeChopEnd: {tick}/{TREE_CHOP_ENV_RUNS} - {(tick / TREE_CHOP_ENV_RUNS * 100):.2f}% - {time() - startTime}s"
-            )
+    return run
 
-        action = env.action_space.sample()
-        obs, rewards, done, info = env.step(action)
 
-        if done:
-            env.reset()
-
-    elapsed = time() - startTime
-    print(f"TreeChopEnd - {elapsed} seconds")
-    print(f"TreeChop - {TREE_CHOP_ENV_RUNS / elapsed} steps/second")
+def setupRaycast() -> Callable[[], None]:
+    game = Game(seed=SEED)
+    position = game.player.getHeadPosition().asTuple()
+    vectors = np.random.default_rng(SEED).uniform(-1, 1, (ACTIONS_COUNT, 3))
+    vectors = [tuple(vector / np.abs(vector).max()) for vector in vectors]
+    index = [0]
 
+    def run():
+        index[0] = (index[0] + 1) % ACTIONS_COUNT
+        game.castRay(position, vectors[index[0]], 8)
 
-VEC3_ROTATE_RUNS = 1_000_000
-# 1_000_000 runs took about 15s
-# PYTHON:       1_000_000/15s -> 66_666  steps/s
-# NUMBA:        1_000_000/ 8s -> 125_000 steps/s
-def benchmark_Vec3Rotate():
-    print(f"Running for {VEC3_ROTATE_RUNS} ticks.")
+    return run
 
-    startTime = time()
-    v = Vec3(1, 1, 1)
-    v.rotate(0, 0)  # Make numba to JIT compile the function.
-    for tick in range(VEC3_ROTATE_RUNS):
-        if not tick % 10_000:
-            print(f"Benchmark Vec3 Rotate: {tick}/{VEC3_ROTATE_RUNS} - {(tick / VEC3_ROTATE_RUNS * 100):.2f}%")
-        v = v.rotate(random(), random())
 
-    elapsed = time() - startTime
-    print(f"Vec3 Rotate - {elapsed} seconds")
+def setupViewport(resolution: int, foveated: bool) -> Callable[[], Callable[[], None]]:
+    # Observation with the viewport rendered every time
+    def setup():
+        env = TreeChopEnv(viewportResX=resolution, viewportResY=resolution, foveatedViewport=foveated,
+                          viewportCache=False, observationView=True)
+        env.seed(SEED)
+        env.reset()
+        return env._getObservation
 
+    return setup
 
-GAME_GET_BLOCK_DISTANCE = 1_000_000
-# 1_000_000 runs took about 15s
-# PYTHON:       100_000/   16s -> 6_250  steps/s
-# NUMBA:        1_000_000/ 14s -> 72_000 steps/s
-def benchmark_gameGetBlockDistance():
-    game = Game()
-    print(f"Running for {GAME_GET_BLOCK_DISTANCE} ticks.")
 
-    startTime = time()
-    game.getBlockDistance()  # Make numba to JIT compile the function.
-    for tick in range(GAME_GET_BLOCK_DISTANCE):
-        if not tick % 10_000:
-            print(f"Benchmark getBlockDistance: "
-                  f"{tick}/{GAME_GET_BLOCK_DISTANCE} - "
-                  f"{(tick / GAME_GET_BLOCK_DISTANCE * 100):.2f}%")
-        game.getBlockDistance(position=game.player.position, vector=Vec3(random(), random(), random()), maxDistance=8)
-
-    elapsed = time() - startTime
-    print(f"getBlockDistance - {elapsed} seconds")
+def setupTreeChopEnvStep() -> Callable[[], None]:
+    env = TreeChopEnv()
+    env.seed(SEED)
+    env.reset()
+    actions = np.random.default_rng(SEED).uniform(-1, 1, (ACTIONS_COUNT,) + env.action_space.shape)
+    actions = actions.astype(np.float32)
+    index = [0]
+
+    def run():
+        index[0] = (index[0] + 1) % ACTIONS_COUNT
+        obs, reward, done, info = env.step(actions[index[0]])
+        if done:
+            env.reset()
 
+    return run
+
+
+def setupTreeChopEnvReset(worldPool: bool) -> Callable[[], Callable[[], None]]:
+    def setup():
+        env = TreeChopEnv(worldPool=WorldPool.generate(WORLD_POOL_SIZE, seed=SEED) if worldPool else None)
+        env.seed(SEED)
+        return env.reset
+
+    return setup
+
+
+def setupBatchedStep(actionRepeat: int = 1, resolution: int = VIEWPORT_RES_X,
+                     foveated: bool = False) -> Callable[[], Callable[[], None]]:
+    def setup():
+        env = BatchedTreeChop(BATCHED_WORLDS, actionRepeat=actionRepeat, viewportResX=resolution,
+                              viewportResY=resolution, foveatedViewport=foveated)
+        env.seed(SEED)
+        env.reset()
+        actions = np.random.default_rng(SEED).uniform(-1, 1, (ACTIONS_COUNT, BATCHED_WORLDS) + env.action_space.shape)
+        actions = actions.astype(np.float32)
+        index = [0]
+
+        def run():
+            index[0] = (index[0] + 1) % ACTIONS_COUNT
+            env.step(actions[index[0]])  # Finished worlds are reset automatically
+
+        return run
+
+    return setup
+
+
+def setupReplay() -> Callable[[], None]:
+    # Whole episodes of random actions, re-simulated without observations
+    seeds = list(range(BATCHED_WORLDS))
+    actions = np.random.default_rng(SEED).uniform(-1, 1, (BATCHED_WORLDS, REPLAY_STEPS, 13)).astype(np.float32)
+
+    def run():
+        replayEpisodes(seeds, actions, maxGameLengthSteps=REPLAY_STEPS)
+
+    return run
+
+
+# name -> (setup, iterations per round, items per call - batched step counts every tick of every world,
+#          replay every episode)
+CASES: Dict[str, Tuple[Callable[[], Callable[[], None]], int, int]] = {
+    "physics": (setupPhysics, 1_000, 1),
+    "block_attack": (setupBlockAttack, 1_000, 1),
+    "raycast": (setupRaycast, 1_000, 1),
+    "viewport_16x16": (setupViewport(16, False), 200, 1),
+    "viewport_32x32": (setupViewport(32, False), 100, 1),
+    "viewport_32x32_foveated": (setupViewport(32, True), 100, 1),
+    "viewport_64x64": (setupViewport(64, False), 50, 1),
+    "step": (setupTreeChopEnvStep, 200, 1),
+    "reset": (setupTreeChopEnvReset(False), 100, 1),
+    "reset_world_pool": (setupTreeChopEnvReset(True), 100, 1),
+    "batched_step": (setupBatchedStep(1), 10, BATCHED_WORLDS),
+    "batched_step_repeat": (setupBatchedStep(ACTION_REPEAT), 10, BATCHED_WORLDS * ACTION_REPEAT),
+    **{f"batched_step_viewport_{resolution}x{resolution}{'_foveated' if foveated else ''}":
+           (setupBatchedStep(resolution=resolution, foveated=foveated), 10, BATCHED_WORLDS)
+       for resolution in VIEWPORT_RESOLUTIONS for foveated in (False, True)},
+    "replay": (setupReplay, 10, BATCHED_WORLDS),
+}
+
+
+##### REST of the CODE #####
+
+def runCase(name: str, rounds: int) -> dict:
+    setup, iterations, items = CASES[name]
+    run = setup()
+
+    for _ in range(max(1, int(iterations * WARMUP_FRACTION))):
+        run()
+
+    times = []
+    for _ in range(rounds):
+        start = perf_counter()
+        for _ in range(iterations):
+            run()
+        times.append((perf_counter() - start) / iterations)
+
+    return {
+        "rounds": rounds,
+        "iterations": iterations,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "stddev": statistics.stdev(times) if rounds > 1 else 0.,
+        "items_per_second": items / statistics.median(times),
+    }
+
+
+def getMachineInfo() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    # Prints the change of every case against the baseline, returns True when some case regressed
+    regressed = False
+    print(f"Compared by {COMPARED_STAT} time per call, threshold {threshold * 100:.0f}%")
+    for name, stats in results.items():
+        if name not in baseline:
+            print(f"{name:<36} | not in baseline")
+            continue
+        change = stats[COMPARED_STAT] / baseline[name][COMPARED_STAT] - 1
+        status = ""
+        if change > threshold:
+            status = "REGRESSION"
+            regressed = True
+        elif change < -threshold:
+            status = "faster"
+        print(f"{name:<36} | {baseline[name][COMPARED_STAT] * 1e6:>10.1f} us -> {stats[COMPARED_STAT] * 1e6:>10.1f} us"
+              f" | {change * 100:>+7.1f}% {status}")
+    return regressed
+
+
+##### REPORTS #####
+# Not timed cases - where a step spends its time
+
+REPORT_STEPS = 5_000
+
+
+def reportProfile():
+    # Phases of TreeChopEnv.step with TreeChopEnv(profile=True)
+    env = TreeChopEnv(profile=True)
+    env.step(env.action_space.sample())  # Make numba to JIT compile the functions.
+    env.profiler.reset()
+    for tick in range(REPORT_STEPS):
+        obs, rewards, done, info = env.step(env.action_space.sample())
+        if done:
+            env.reset()
 
-ENV_GET_OBSERVATION = 1_000
+    print(env.profiler.dump())
 
 
-# 1_000_000 runs took about 15s
-# PYTHON:       100/  12s -> 8   steps/s
-# NUMBA:        1_000/7s ->  143 steps/s
-def benchmark_envGetObservation():
+def reportQueryCache():
+    # Calls of the cached Game queries avoided per TreeChopEnv step
     env = TreeChopEnv()
-    print(f"Running for {ENV_GET_OBSERVATION} ticks.")
-
-    startTime = time()
-    env._getObservation()  # Make numba to JIT compile the function.
-    for tick in range(ENV_GET_OBSERVATION):
-        if not tick % 1_000:
-            print(f"Benchmark env_getObservtion: "
-                  f"{tick}/{ENV_GET_OBSERVATION} - "
-                  f"{(tick / ENV_GET_OBSERVATION * 100):.2f}%")
-        env._getObservation()
-
-    elapsed = time() - startTime
-    print(f"env_getObservtion - {elapsed} seconds")
-
+    hits, misses = {}, {}
+    for tick in range(REPORT_STEPS):
+        obs, rewards, done, info = env.step(env.action_space.sample())
+        if done:
+            # Each game has its own counters
+            for query, (queryHits, queryMisses) in env.game.getQueryCacheStats().items():
+                hits[query] = hits.get(query, 0) + queryHits
+                misses[query] = misses.get(query, 0) + queryMisses
+            env.reset()
 
-def main():
-    # benchmark_physics()
-    # benchmark_blockAttack()
-    benchmark_TreeChopEnv()
-    # benchmark_Vec3Rotate()
-    # benchmark_gameGetBlockDistance()
-    # benchmark_envGetObservation()
+    for query in sorted(hits):
+        calls = hits[query] + misses[query]
+        print(f"{query:<26} - {calls / REPORT_STEPS:.2f} calls/step, "
+              f"{hits[query] / REPORT_STEPS:.2f} avoided ({hits[query] / max(1, calls) * 100:.0f}%)")
+
+
+REPORTS = {
+    "profile": reportProfile,
+    "query_cache": reportQueryCache,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the TreeChop simulation.")
+    parser.add_argument("cases", nargs="*", metavar="case",
+                        help=f"Cases to run (default: all) - {', '.join(CASES)}")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help=f"Timed rounds per case (default: {ROUNDS})")
+    parser.add_argument("--json", type=str, default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=str, default=None,
+                        help="JSON file of a previous run, exits with 1 when some case got slower than --threshold")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help=f"Allowed slowdown against --compare (default: {REGRESSION_THRESHOLD})")
+    parser.add_argument("--report", choices=list(REPORTS), default=None,
+                        help="Print a report instead of timing the cases")
+    args = parser.parse_args()
+    unknownCases = set(args.cases) - set(CASES)
+    if unknownCases:
+        parser.error(f"Unknown cases: {', '.join(sorted(unknownCases))}")
+
+    if args.report:
+        REPORTS[args.report]()
+        return 0
+
+    results = {}
+    print(f"{'case':<36} | {'min us':>10} | {'median us':>10} | {'stddev us':>10} | {'items/s':>10}")
+    for name in args.cases or CASES:
+        stats = results[name] = runCase(name, args.rounds)
+        print(f"{name:<36} | {stats['min'] * 1e6:>10.1f} | {stats['median'] * 1e6:>10.1f} | "
+              f"{stats['stddev'] * 1e6:>10.1f} | {stats['items_per_second']:>10.0f}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"machine": getMachineInfo(), "cases": results}, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["cases"]
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
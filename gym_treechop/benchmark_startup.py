@@ -0,0 +1,97 @@
+"""
+Startup benchmark - how long a fresh process (eg. a SharedMemoryVecEnv worker) takes until it can step.
+Every measurement runs in a new python process, so import time and numba compilation / cache loading are included.
+
+Run: python -m gym_treechop.benchmark_startup [--clear-cache]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from gym_treechop.game.jitcache import clearNumbaCache
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+REPOSITORY_DIR = PACKAGE_DIR.parent
+
+# Seconds a worker may take from process start until its first step is done (numba cache already populated)
+STARTUP_BUDGET_SECONDS = 5
+
+STARTUP_SCRIPT = """
+import json
+from time import perf_counter
+
+start = perf_counter()
+{imports}
+imported = perf_counter()
+
+env = {create}
+env.reset()
+resetDone = perf_counter()
+
+actions = {actions}
+env.step(actions)
+firstStep = perf_counter()
+
+env.step(actions)
+secondStep = perf_counter()
+
+print(json.dumps({{
+    "import": imported - start,
+    "first_reset": resetDone - imported,
+    "first_step": firstStep - resetDone,
+    "second_step": secondStep - firstStep,
+    "total": firstStep - start,
+}}))
+"""
+
+TARGETS = {
+    "TreeChopEnv": {
+        "imports": "from gym_treechop.TreeChopEnv import TreeChopEnv",
+        "create": "TreeChopEnv()",
+        "actions": "env.action_space.sample()",
+    },
+    "BatchedTreeChop": {
+        "imports": "import numpy as np\nfrom gym_treechop.BatchedTreeChop import BatchedTreeChop",
+        "create": "BatchedTreeChop(8)",
+        "actions": "np.zeros((8,) + env.actionShape, dtype=np.float32)",
+    },
+}
+
+
+def measureStartup(target: str) -> dict:
+    script = STARTUP_SCRIPT.format(**TARGETS[target])
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPOSITORY_DIR),
+                                                                            os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-c", script], cwd=str(REPOSITORY_DIR), env=environment,
+                            stdout=subprocess.PIPE, check=True, universal_newlines=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure import time and first step latency of fresh processes.")
+    parser.add_argument("--clear-cache", action="store_true", help="Remove numba cache files first (cold start)")
+    args = parser.parse_args()
+
+    if args.clear_cache:
+        print(f"Removed {clearNumbaCache()} numba cache files")
+
+    overBudget = False
+    for target in TARGETS:
+        times = measureStartup(target)
+        print(f"{target}:")
+        print(f"  import      - {times['import']:.3f} seconds")
+        print(f"  first reset - {times['first_reset']:.3f} seconds")
+        print(f"  first step  - {times['first_step']:.3f} seconds")
+        print(f"  second step - {times['second_step']:.4f} seconds")
+        print(f"  total until first step - {times['total']:.3f} seconds (budget {STARTUP_BUDGET_SECONDS} seconds)")
+        if not args.clear_cache:  # Budget is for workers started with populated numba cache
+            overBudget |= times["total"] > STARTUP_BUDGET_SECONDS
+
+    return 1 if overBudget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import gym_treechop.game.jitcache  # noqa: F401 - Removes stale numba cache before kernels reading these load it
 from gym_treechop.game.structures import Vec3
 
 block_names = {
@@ -19,6 +20,16 @@ class Blocks:
         return block_names[blockId]
 
 
+class Faces:  # Side of a block hit by a ray
+    NONE = -1
+    X_MINUS = 0
+    X_PLUS = 1
+    Y_MINUS = 2
+    Y_PLUS = 3
+    Z_MINUS = 4  # Bottom
+    Z_PLUS = 5  # Top
+
+
 BlockHardness = {  # Default seconds required to break
     Blocks.AIR: 0.0000001,
     Blocks.GROUND: 0.5,
@@ -32,16 +43,23 @@ BREAKING_RANGE = 4.5  # Blocks
 HARDNESS_MULTIPLIER = 1.5
 NOT_STANDING_BREAK_SLOWDOWN = 5  # When not standing the block is broken 5x longer
 
-# Environment is 9x9x9 blocks -> 729 blocks in total
+# Default environment is 9x9x9 blocks -> 729 blocks in total, Game(worldShape=...) can be larger
 WORLD_SHAPE = Vec3(9, 9, 9)
 WORLD_SHAPE_TUPLE = (WORLD_SHAPE.x, WORLD_SHAPE.y, WORLD_SHAPE.z)
 
+# Environment is split into 16x16x16 chunks, rays longer than a chunk skip chunks without any block
+CHUNK_SHIFT = 4
+CHUNK_SIZE = 1 << CHUNK_SHIFT
+
 PLAYER_RADIUS = 0.3
 PLAYER_HEIGHT = 1.8
 
 MIN_TREE_HEIGHT = 6
 MAX_TREE_HEIGHT = 6  # 7 might be undestroyable in some situations without building blocks
+LEAF_RADIUS = 2  # Leaves reach 2 blocks from the trunk, trees are placed at least this far from the world border
+TREE_SPACING = 5  # Forest is a grid of 5x5 cells with at most one tree in each cell
 
+DELTA = 0.1  # Physics step, 10 of them are one tick
 GRAVITY = 0.08  # Blocks / 1 tick^2
 
 TERMINAL_VELOCITY = 3.92  # Blocks / 1 tick
@@ -0,0 +1,31 @@
+import logging
+from collections import Counter
+from typing import Dict
+
+# Silent unless configured, eg. logging.getLogger("gym_treechop").setLevel(logging.DEBUG) with a handler
+logger = logging.getLogger("gym_treechop")
+
+
+class EpisodeEvents:
+    """
+    In memory counters of what happened in the current episode (chopped blocks, looks at the target, ...).
+    endEpisode() adds them to the totals of all episodes, every event is logged at DEBUG level too.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.totals = Counter()
+        self.episodes = 0
+
+    def add(self, event: str):
+        self.counts[event] += 1
+        logger.debug("Event %s", event)
+
+    def getCounts(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+    def endEpisode(self):
+        if self.counts:
+            self.totals.update(self.counts)
+            self.counts.clear()
+        self.episodes += 1
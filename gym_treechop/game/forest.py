@@ -0,0 +1,89 @@
+import numpy as np
+
+from gym_treechop.game.constants import Blocks, MIN_TREE_HEIGHT, MAX_TREE_HEIGHT, LEAF_RADIUS, TREE_SPACING
+from gym_treechop.game.structures import Vec3
+
+# Terrain and trees are generated with whole array operations, no python loop over blocks or trees.
+# All randomness comes from the passed Generator, same seed -> same world.
+
+
+def getLeafOffsets() -> np.ndarray:
+    # (dz, dy, dx) of leaf blocks relative to the top of the trunk
+    offsets = []
+    for dz, radius in ((0, 1), (-1, LEAF_RADIUS), (-2, LEAF_RADIUS)):
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                if dx or dy:
+                    offsets.append((dz, dy, dx))
+    return np.array(offsets, dtype=np.int64)
+
+
+LEAF_OFFSETS = getLeafOffsets()
+SPAWN_CANDIDATES = 16
+
+
+def generateGround(environment: np.ndarray, random: np.random.Generator) -> np.ndarray:
+    # Bottom layer is full, second layer has ground where the heightmap is 1 -> heightmap[y, x]
+    heightmap = random.integers(0, 2, size=environment.shape[1:])  # 0 or 1
+    environment[0] = Blocks.GROUND
+    environment[1][heightmap == 1] = Blocks.GROUND
+    return heightmap
+
+
+def placeTrees(worldShape: Vec3, treeCount: int, random: np.random.Generator) -> np.ndarray:
+    # Trunk positions -> trees[i] = (x, y)
+    if treeCount == 1:
+        return np.array([[worldShape.x // 2, worldShape.y // 2]], dtype=np.int64)
+
+    # Leaves have to fit into the world, the area is split into TREE_SPACING^2 cells, one tree per cell
+    low = LEAF_RADIUS
+    cellsX = max(1, (worldShape.x - 2 * LEAF_RADIUS) // TREE_SPACING)
+    cellsY = max(1, (worldShape.y - 2 * LEAF_RADIUS) // TREE_SPACING)
+    if treeCount > cellsX * cellsY:
+        raise ValueError(f"World {worldShape} has room for {cellsX * cellsY} trees, {treeCount} requested")
+
+    cells = random.choice(cellsX * cellsY, treeCount, replace=False)
+    cellY, cellX = np.divmod(cells, cellsX)
+    spanX = min(TREE_SPACING, worldShape.x - 2 * LEAF_RADIUS)
+    spanY = min(TREE_SPACING, worldShape.y - 2 * LEAF_RADIUS)
+    x = low + cellX * TREE_SPACING + random.integers(0, spanX, size=treeCount)
+    y = low + cellY * TREE_SPACING + random.integers(0, spanY, size=treeCount)
+    return np.stack((x, y), axis=1).astype(np.int64)
+
+
+def generateTrees(environment: np.ndarray, trees: np.ndarray, treeBlocks: int,
+                  random: np.random.Generator) -> np.ndarray:
+    # Trunks have treeBlocks wood blocks from the top down, returns the top of each trunk -> heights[i]
+    heights = random.integers(MIN_TREE_HEIGHT, MAX_TREE_HEIGHT + 1, size=len(trees))
+    x, y = trees[:, 0:1], trees[:, 1:2]
+
+    # Leaves first, so the trunks of close trees are not overwritten
+    leafZ = heights[:, None] + LEAF_OFFSETS[None, :, 0]
+    leafY = y + LEAF_OFFSETS[None, :, 1]
+    leafX = x + LEAF_OFFSETS[None, :, 2]
+    inside = ((0 <= leafZ) & (leafZ < environment.shape[0]) & (0 <= leafY) & (leafY < environment.shape[1])
+              & (0 <= leafX) & (leafX < environment.shape[2]))
+    environment[leafZ[inside], leafY[inside], leafX[inside]] = Blocks.LEAF
+
+    trunkZ = heights[:, None] - np.arange(treeBlocks)[None, :]
+    trunkX, trunkY = np.broadcast_to(x, trunkZ.shape), np.broadcast_to(y, trunkZ.shape)
+    inside = (0 <= trunkZ) & (trunkZ < environment.shape[0])
+    environment[trunkZ[inside], trunkY[inside], trunkX[inside]] = Blocks.WOOD
+    return heights
+
+
+def getLowestWood(environment: np.ndarray, trees: np.ndarray) -> np.ndarray:
+    # Lowest wood block of each trunk -> lowestWood[i], -1 when the trunk has no wood left
+    columns = environment[:, trees[:, 1], trees[:, 0]] == Blocks.WOOD  # columns[z, i]
+    return np.where(columns.any(axis=0), columns.argmax(axis=0), -1).astype(np.int64)
+
+
+def getSpawnPosition(worldShape: Vec3, trees: np.ndarray, minDistance: float,
+                     random: np.random.Generator) -> (float, float):
+    # Random (x, y) at least minDistance from the middle of every trunk, candidates are tested in batches
+    while True:
+        candidates = random.random((SPAWN_CANDIDATES, 2)) * (worldShape.x, worldShape.y)
+        distances = np.sqrt(((candidates[:, None, :] - (trees[None, :, :] + 0.5)) ** 2).sum(axis=2)).min(axis=1)
+        valid = np.flatnonzero(distances >= minDistance)
+        if len(valid):
+            return tuple(candidates[valid[0]])
@@ -1,124 +1,339 @@
 import math
-from math import copysign
-from random import random, randint
+from collections import Counter
 from typing import List
 
 import numpy as np
 from numba import jit
-from tensorflow.keras.utils import to_categorical
 
-from gym_treechop.game.constants import MIN_TREE_HEIGHT, WORLD_SHAPE, MAX_TREE_HEIGHT, Blocks, JUMP_VELOCITY, \
-    WALK_VELOCITY, BLOCK_TYPES, BlockHardness, HARDNESS_MULTIPLIER, BREAKING_RANGE, WORLD_SHAPE_TUPLE
+from gym_treechop.game.constants import WORLD_SHAPE, Blocks, JUMP_VELOCITY, \
+    WALK_VELOCITY, BLOCK_TYPES, BlockHardness, HARDNESS_MULTIPLIER, BREAKING_RANGE, Faces, CHUNK_SHIFT, CHUNK_SIZE
+from gym_treechop.game.events import logger
+from gym_treechop.game.forest import generateGround, placeTrees, generateTrees, getLowestWood, getSpawnPosition
 from gym_treechop.game.structures import Vec3, Vec2, Axis
-from gym_treechop.game.utils import playerIsStanding, getDistance
+from gym_treechop.game.utils import playerIsStanding
 
 
 ##### NUMBA functions #####
-@jit(nopython=True)
-def numba_getBlock(environment: np.ndarray, pos: (float, float, float)) -> int:
-    pos = (math.floor(pos[0]), math.floor(pos[1]), math.floor(pos[2]))
-    if numba_isInEnvironment(pos):
-        return environment[pos[2], pos[1], pos[0]]
-    else:
-        return 0
+# Numba can not read attributes of the Blocks and Faces classes
+GROUND = Blocks.GROUND
+WOOD = Blocks.WOOD
+LEAF = Blocks.LEAF
+
+FACE_NONE = Faces.NONE
+FACE_X_MINUS, FACE_X_PLUS = Faces.X_MINUS, Faces.X_PLUS
+FACE_Y_MINUS, FACE_Y_PLUS = Faces.Y_MINUS, Faces.Y_PLUS
+FACE_Z_MINUS, FACE_Z_PLUS = Faces.Z_MINUS, Faces.Z_PLUS
+
+CHUNK_MASK = CHUNK_SIZE - 1  # block & CHUNK_MASK -> position inside of the chunk
+
+
+@jit(nopython=True, cache=True)
+def numba_castRay(environment: np.ndarray, pos: (float, float, float), vec: (float, float, float),
+                  maxDistance: float) -> (int, int, int, int, int, float):
+    """
+    Amanatides-Woo voxel traversal, vec has to be a unit vector. The block the ray starts in is skipped.
+    Returns (block, x, y, z, face, distance) of the first not air block, face is one of Faces.
+    When nothing is hit within maxDistance or the ray leaves the environment -> (0, -1, -1, -1, Faces.NONE, maxDistance).
+    """
+    blockX, blockY, blockZ = math.floor(pos[0]), math.floor(pos[1]), math.floor(pos[2])
+
+    # step -> direction of the traversal, tMax -> distance to the next block border, tDelta -> distance of one block
+    stepX, tMaxX, tDeltaX = 0, math.inf, math.inf
+    if vec[0] > 0:
+        stepX, tMaxX, tDeltaX = 1, (blockX + 1 - pos[0]) / vec[0], 1 / vec[0]
+    elif vec[0] < 0:
+        stepX, tMaxX, tDeltaX = -1, (blockX - pos[0]) / vec[0], -1 / vec[0]
+
+    stepY, tMaxY, tDeltaY = 0, math.inf, math.inf
+    if vec[1] > 0:
+        stepY, tMaxY, tDeltaY = 1, (blockY + 1 - pos[1]) / vec[1], 1 / vec[1]
+    elif vec[1] < 0:
+        stepY, tMaxY, tDeltaY = -1, (blockY - pos[1]) / vec[1], -1 / vec[1]
+
+    stepZ, tMaxZ, tDeltaZ = 0, math.inf, math.inf
+    if vec[2] > 0:
+        stepZ, tMaxZ, tDeltaZ = 1, (blockZ + 1 - pos[2]) / vec[2], 1 / vec[2]
+    elif vec[2] < 0:
+        stepZ, tMaxZ, tDeltaZ = -1, (blockZ - pos[2]) / vec[2], -1 / vec[2]
 
+    while True:
+        if tMaxX <= tMaxY and tMaxX <= tMaxZ:
+            distance = tMaxX
+            blockX += stepX
+            tMaxX += tDeltaX
+            face = FACE_X_MINUS if stepX > 0 else FACE_X_PLUS
+        elif tMaxY <= tMaxZ:
+            distance = tMaxY
+            blockY += stepY
+            tMaxY += tDeltaY
+            face = FACE_Y_MINUS if stepY > 0 else FACE_Y_PLUS
+        else:
+            distance = tMaxZ
+            blockZ += stepZ
+            tMaxZ += tDeltaZ
+            face = FACE_Z_MINUS if stepZ > 0 else FACE_Z_PLUS
 
-@jit(nopython=True)
-def numba_isInEnvironment(pos: (float, float, float)):
-    posX = math.floor(pos[0])
-    posY = math.floor(pos[1])
-    posZ = math.floor(pos[2])
-    if (WORLD_SHAPE_TUPLE[0] <= posX or posX < 0
-            or WORLD_SHAPE_TUPLE[1] <= posY or posY < 0
-            or WORLD_SHAPE_TUPLE[2] <= posZ or posZ < 0):
-        return False
-    else:
-        return True
+        if distance > maxDistance:
+            return 0, -1, -1, -1, FACE_NONE, maxDistance
 
+        if (not 0 <= blockX < environment.shape[2]
+                or not 0 <= blockY < environment.shape[1]
+                or not 0 <= blockZ < environment.shape[0]):
+            return 0, -1, -1, -1, FACE_NONE, maxDistance
 
-@jit(nopython=True)
-def numba_getNextBlock(pos: (float, float, float),
-                       vec: (float, float, float)) -> ((float, float, float), (float, float, float)):
-    toFullX = copysign((copysign(1 - (pos[0] % 1), vec[0]) % 1), vec[0])
-    toFullY = copysign((copysign(1 - (pos[1] % 1), vec[1]) % 1), vec[1])
-    toFullZ = copysign((copysign(1 - (pos[2] % 1), vec[2]) % 1), vec[2])
+        block = environment[blockZ, blockY, blockX]
+        if block != 0:
+            return block, blockX, blockY, blockZ, face, distance
 
-    toFullX = toFullX or copysign(1, toFullX)
-    toFullY = toFullY or copysign(1, toFullY)
-    toFullZ = toFullZ or copysign(1, toFullZ)
 
-    relativeX = toFullX / (vec[0] or 0.00000000001)
-    relativeY = toFullY / (vec[1] or 0.00000000001)
-    relativeZ = toFullZ / (vec[2] or 0.00000000001)
+@jit(nopython=True, cache=True)
+def numba_getChunkSteps(block: int, step: int, tMax: float, tDelta: float, tExit: float) -> int:
+    # How many block borders of one axis are crossed before tExit, never leaving the chunk of block
+    if step == 0 or tMax >= tExit:
+        return 0
+    if step > 0:
+        toBorder = CHUNK_MASK - (block & CHUNK_MASK)
+    else:
+        toBorder = block & CHUNK_MASK
+    return min(toBorder, math.ceil((tExit - tMax) / tDelta))
+
+
+@jit(nopython=True, cache=True)
+def numba_getChunkExit(block: int, step: int, tMax: float, tDelta: float) -> float:
+    # Distance at which the ray leaves the chunk of block on one axis
+    if step > 0:
+        return tMax + (CHUNK_MASK - (block & CHUNK_MASK)) * tDelta
+    if step < 0:
+        return tMax + (block & CHUNK_MASK) * tDelta
+    return math.inf
+
+
+@jit(nopython=True, cache=True)
+def numba_castRayChunked(environment: np.ndarray, chunks: np.ndarray, pos: (float, float, float),
+                         vec: (float, float, float), maxDistance: float) -> (int, int, int, int, int, float):
+    """
+    Same as numba_castRay, but empty chunks are crossed in one jump without reading their blocks.
+    chunks[z, y, x] -> number of blocks in each chunk (see countChunkBlocks).
+    Pays off for rays longer than a chunk, short rays (viewport, breaking range) are faster with numba_castRay.
+    """
+    blockX, blockY, blockZ = math.floor(pos[0]), math.floor(pos[1]), math.floor(pos[2])
+
+    # step -> direction of the traversal, tMax -> distance to the next block border, tDelta -> distance of one block
+    stepX, tMaxX, tDeltaX = 0, math.inf, math.inf
+    if vec[0] > 0:
+        stepX, tMaxX, tDeltaX = 1, (blockX + 1 - pos[0]) / vec[0], 1 / vec[0]
+    elif vec[0] < 0:
+        stepX, tMaxX, tDeltaX = -1, (blockX - pos[0]) / vec[0], -1 / vec[0]
+
+    stepY, tMaxY, tDeltaY = 0, math.inf, math.inf
+    if vec[1] > 0:
+        stepY, tMaxY, tDeltaY = 1, (blockY + 1 - pos[1]) / vec[1], 1 / vec[1]
+    elif vec[1] < 0:
+        stepY, tMaxY, tDeltaY = -1, (blockY - pos[1]) / vec[1], -1 / vec[1]
+
+    stepZ, tMaxZ, tDeltaZ = 0, math.inf, math.inf
+    if vec[2] > 0:
+        stepZ, tMaxZ, tDeltaZ = 1, (blockZ + 1 - pos[2]) / vec[2], 1 / vec[2]
+    elif vec[2] < 0:
+        stepZ, tMaxZ, tDeltaZ = -1, (blockZ - pos[2]) / vec[2], -1 / vec[2]
+
+    # Chunks are only looked up when the ray enters one, blocks outside of the environment have no chunk
+    checkChunk = (0 <= blockX < environment.shape[2] and 0 <= blockY < environment.shape[1]
+                  and 0 <= blockZ < environment.shape[0])
+    while True:
+        if checkChunk and not chunks[blockZ >> CHUNK_SHIFT, blockY >> CHUNK_SHIFT, blockX >> CHUNK_SHIFT]:
+            # Empty chunk -> move to the last block before leaving it, no block has to be read on the way
+            tExit = min(numba_getChunkExit(blockX, stepX, tMaxX, tDeltaX),
+                        numba_getChunkExit(blockY, stepY, tMaxY, tDeltaY),
+                        numba_getChunkExit(blockZ, stepZ, tMaxZ, tDeltaZ))
+            if tExit > maxDistance:
+                return 0, -1, -1, -1, FACE_NONE, maxDistance
+
+            # Axes without steps are skipped, 0 * inf would be nan
+            steps = numba_getChunkSteps(blockX, stepX, tMaxX, tDeltaX, tExit)
+            if steps:
+                blockX, tMaxX = blockX + steps * stepX, tMaxX + steps * tDeltaX
+            steps = numba_getChunkSteps(blockY, stepY, tMaxY, tDeltaY, tExit)
+            if steps:
+                blockY, tMaxY = blockY + steps * stepY, tMaxY + steps * tDeltaY
+            steps = numba_getChunkSteps(blockZ, stepZ, tMaxZ, tDeltaZ, tExit)
+            if steps:
+                blockZ, tMaxZ = blockZ + steps * stepZ, tMaxZ + steps * tDeltaZ
+
+        if tMaxX <= tMaxY and tMaxX <= tMaxZ:
+            distance = tMaxX
+            blockX += stepX
+            tMaxX += tDeltaX
+            face = FACE_X_MINUS if stepX > 0 else FACE_X_PLUS
+            checkChunk = (blockX & CHUNK_MASK) == (0 if stepX > 0 else CHUNK_MASK)
+        elif tMaxY <= tMaxZ:
+            distance = tMaxY
+            blockY += stepY
+            tMaxY += tDeltaY
+            face = FACE_Y_MINUS if stepY > 0 else FACE_Y_PLUS
+            checkChunk = (blockY & CHUNK_MASK) == (0 if stepY > 0 else CHUNK_MASK)
+        else:
+            distance = tMaxZ
+            blockZ += stepZ
+            tMaxZ += tDeltaZ
+            face = FACE_Z_MINUS if stepZ > 0 else FACE_Z_PLUS
+            checkChunk = (blockZ & CHUNK_MASK) == (0 if stepZ > 0 else CHUNK_MASK)
 
-    relativeMove = min(relativeX, relativeY, relativeZ)
+        if distance > maxDistance:
+            return 0, -1, -1, -1, FACE_NONE, maxDistance
 
-    movedX = pos[0] + vec[0] * relativeMove
-    movedY = pos[1] + vec[1] * relativeMove
-    movedZ = pos[2] + vec[2] * relativeMove
+        if (not 0 <= blockX < environment.shape[2]
+                or not 0 <= blockY < environment.shape[1]
+                or not 0 <= blockZ < environment.shape[0]):
+            return 0, -1, -1, -1, FACE_NONE, maxDistance
 
-    rayX, rayY, rayZ = movedX, movedY, movedZ
+        block = environment[blockZ, blockY, blockX]
+        if block != 0:
+            return block, blockX, blockY, blockZ, face, distance
 
-    if relativeMove == relativeX:
-        movedX = float(round(movedX))
-    if relativeMove == relativeY:
-        movedY = float(round(movedY))
-    if relativeMove == relativeZ:
-        movedZ = float(round(movedZ))
 
-    return (movedX, movedY, movedZ), (rayX, rayY, rayZ)
+@jit(nopython=True, cache=True)
+def numba_normalize(vec: (float, float, float)) -> (float, float, float):
+    length = math.sqrt(vec[0] ** 2 + vec[1] ** 2 + vec[2] ** 2)
+    if length:
+        return vec[0] / length, vec[1] / length, vec[2] / length
+    return 0., 0., 0.
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def numba_getBlockDistance(pos: (float, float, float), vec: (float, float, float),
                            maxDistance: float, environment: np.ndarray) -> float:
-    blockPos, rayPos = numba_getNextBlock(pos, vec)
-    while True:
-        distanceToBlock = getDistance(pos, rayPos)
-        if not numba_isInEnvironment(blockPos):
-            return maxDistance
+    return numba_castRay(environment, pos, vec, maxDistance)[5]
+
+
+@jit(nopython=True, cache=True)
+def numba_getBlockInFront(environment: np.ndarray, position: (float, float, float), direction: (float, float, float),
+                          lookingRange: float) -> (int, int, int, int):
+    # -> (block, x, y, z), (0, -1, -1, -1) when there is no block in range
+    block, x, y, z, _, _ = numba_castRay(environment, position, numba_normalize(direction), lookingRange)
+    return block, x, y, z
 
-        if distanceToBlock > maxDistance:
-            return maxDistance
 
-        if numba_getBlock(environment, blockPos) != 0:
-            return distanceToBlock
+@jit(nopython=True, cache=True)
+def numba_getLookingDirectionVector(rotation: np.ndarray) -> (float, float, float):
+    # Same as Player.getLookingDirectionVector, rotation -> (leftRight, upDown)
+    y = math.sin(rotation[0])
+    x = math.cos(rotation[0])
 
-        blockPos, rayPos = numba_getNextBlock(blockPos, vec)
+    z = math.sin(rotation[1] - math.pi / 2)
+    zRot = math.cos(rotation[1] - math.pi / 2)
+
+    x, y = x * zRot, y * zRot
+    m = max(abs(x), abs(y), abs(z))
+    if m:
+        return x / m, y / m, z / m
+    else:
+        return 1.0, 1.0, 1.0
+
+
+@jit(nopython=True, cache=True)
+def numba_getNextWoodBlock(trees: np.ndarray, lowestWood: np.ndarray,
+                           position: (float, float, float)) -> (int, int, int):
+    # Lowest wood block of the trunk nearest to the player, (-1, -1, -1) when there is no wood left
+    # trees[i] -> (x, y) of the trunk, lowestWood[i] -> its lowest wood layer or -1
+    best, bestDistance = -1, math.inf
+    for i in range(trees.shape[0]):
+        if lowestWood[i] >= 0:
+            distance = (trees[i, 0] + 0.5 - position[0]) ** 2 + (trees[i, 1] + 0.5 - position[1]) ** 2
+            if distance < bestDistance:
+                best, bestDistance = i, distance
+    if best == -1:
+        return -1, -1, -1
+    return trees[best, 0], trees[best, 1], lowestWood[best]
+
+
+@jit(nopython=True, cache=True)
+def numba_getDistanceToNearestTree(trees: np.ndarray, position: (float, float, float)) -> float:
+    # Horizontal distance to the nearest trunk, trees[i] -> (x, y) of the trunk
+    bestDistance = math.inf
+    for i in range(trees.shape[0]):
+        bestDistance = min(bestDistance, (position[0] - trees[i, 0]) ** 2 + (position[1] - trees[i, 1]) ** 2)
+    return math.sqrt(bestDistance)
+
+
+@jit(nopython=True, cache=True)
+def numba_updateLowestWood(environment: np.ndarray, trees: np.ndarray, lowestWood: np.ndarray, x: int, y: int):
+    # Wood at (x, y) was added or removed, rescan the trunk standing there
+    for i in range(trees.shape[0]):
+        if trees[i, 0] == x and trees[i, 1] == y:
+            lowestWood[i] = -1
+            for z in range(environment.shape[0]):
+                if environment[z, y, x] == WOOD:
+                    lowestWood[i] = z
+                    break
 
 
 ##### REST of the CODE #####
 
-def randNotInCenter(size: int, centerDiameter: int = 1):
+# Games created without a seed or random generator draw from this one
+WORLD_RANDOM = np.random.default_rng()
+
+
+def getChunkShape(worldShape: Vec3) -> (int, int, int):
+    # Number of chunks (z, y, x), chunks on the border may be partially outside of the environment
+    return tuple(-(-size // CHUNK_SIZE) for size in (worldShape.z, worldShape.y, worldShape.x))
+
+
+def countChunkBlocks(environment: np.ndarray) -> np.ndarray:
+    # Number of not air blocks in each chunk -> chunks[z, y, x]
+    z, y, x = environment.shape
+    chunksZ, chunksY, chunksX = getChunkShape(Vec3(x, y, z))
+    padded = np.zeros((chunksZ * CHUNK_SIZE, chunksY * CHUNK_SIZE, chunksX * CHUNK_SIZE), dtype=np.bool_)
+    padded[:z, :y, :x] = environment != Blocks.AIR
+    padded = padded.reshape((chunksZ, CHUNK_SIZE, chunksY, CHUNK_SIZE, chunksX, CHUNK_SIZE))
+    return np.count_nonzero(padded, axis=(1, 3, 5)).astype(np.int32)
+
+
+def randNotInCenter(random: np.random.Generator, size: int, centerDiameter: int = 1):
     # 0, 1, _2_, 3, __4__, 5, _6_, 7, 8
     center = size // 2
     if centerDiameter > center:
         centerDiameter = center
 
-    move = centerDiameter + random() * (center - centerDiameter - 1)
-    if random() > 0.5:
+    move = centerDiameter + random.random() * (center - centerDiameter - 1)
+    if random.random() > 0.5:
         move = -move
 
     return center + move
 
 
 class Player:
-    position: Vec3 = Vec3()
-    rotation: Vec2 = Vec2()  # X -> left/right (0-2PI), Y -> up/down (0(down) - 1PI(up))
-    velocity: Vec3 = Vec3()
-
-    def __init__(self):
-        self.position.x = randNotInCenter(WORLD_SHAPE.x)  # 0-maxX, not in center
-        self.position.y = randNotInCenter(WORLD_SHAPE.y)  # 0-maxY, not in center
-        self.position.z = 2
-
-        self.rotation.x = random() * 2 * math.pi
-        self.rotation.y = random() * math.pi
+    # Every player has its own vectors, players of envs in the same process do not share any state
+    __slots__ = ("position", "rotation", "velocity", "lookingDirectionKey", "lookingDirection", "queryCacheHits",
+                 "queryCacheMisses")
+    position: Vec3
+    rotation: Vec2  # X -> left/right (0-2PI), Y -> up/down (0(down) - 1PI(up))
+    velocity: Vec3
+
+    def __init__(self, random: np.random.Generator, worldShape: Vec3 = WORLD_SHAPE):
+        x = randNotInCenter(random, worldShape.x)  # 0-maxX, not in center
+        y = randNotInCenter(random, worldShape.y)  # 0-maxY, not in center
+        self.position = Vec3(x, y, 2)
+        self.velocity = Vec3()
+
+        self.rotation = Vec2(random.random() * 2 * math.pi, random.random() * math.pi)
+
+        # Looking direction of the last rotation, returned again until the rotation changes
+        self.lookingDirectionKey = None
+        self.lookingDirection = None
+        self.queryCacheHits = Counter()
+        self.queryCacheMisses = Counter()
 
     def getHeadPosition(self) -> Vec3:
         return Vec3(self.position.x, self.position.y, self.position.z + 1)
 
     def getLookingDirectionVector(self) -> Vec3:
+        key = (self.rotation.x, self.rotation.y)
+        if key == self.lookingDirectionKey:
+            self.queryCacheHits["getLookingDirectionVector"] += 1
+            return self.lookingDirection
+        self.queryCacheMisses["getLookingDirectionVector"] += 1
+
         y = math.sin(self.rotation.x)
         x = math.cos(self.rotation.x)
 
@@ -126,7 +341,9 @@ class Player:
         zRot = math.cos(self.rotation.y - math.pi / 2)
 
         vec = Vec3(x * zRot, y * zRot, z)
-        return vec.normalize()
+        self.lookingDirectionKey = key
+        self.lookingDirection = vec.normalize()
+        return self.lookingDirection
 
     def getLookingDirectionVector2d(self) -> Vec2:
         y = math.sin(self.rotation.x)
@@ -137,91 +354,111 @@ class Player:
 class Game:
     # environment[z, y, x]
     environment: np.ndarray
+    # chunks[z, y, x] -> number of not air blocks in each CHUNK_SIZE^3 chunk, long rays skip empty chunks
+    chunks: np.ndarray
     player: Player
-    center: int = WORLD_SHAPE.x // 2
+    worldShape: Vec3
+    center: Vec2  # (x, y) of the center tree trunk
+    trees: np.ndarray  # trees[i] -> (x, y) of the trunk
 
     oneHotEncodedCache = None
-    woodLeftCache = None
-    woodBlocksCache = None
+    worldVersion = 0  # Changes with every block change, caches of rendered views compare it
+
+    # Results of the last getBlockInFrontOfPlayer() / getNextWoodBlock() queries. They are keyed by player position,
+    # rotation and worldVersion, so within a step each of them runs once until the player moves or a block changes.
+    # The returned Vec3 are shared, callers must not modify them.
+    blockInFrontKey = None
+    blockInFront = None
+    nextWoodBlockKey = None
+    nextWoodBlock = None
+
+    # Kept up to date by _setBlock, so the queries below do not scan the environment
+    blockCounts: np.ndarray  # blockCounts[block] -> number of blocks of that type
+    woodPerLayer: np.ndarray  # woodPerLayer[z] -> number of wood blocks in layer z
+    lowestWood: np.ndarray  # lowestWood[i] -> lowest wood layer of trees[i], -1 when the trunk has no wood left
 
     def getEnvironmentOneHotEncoded(self):
         if self.oneHotEncodedCache is None:
-            self.oneHotEncodedCache = to_categorical(self.environment.flatten(), num_classes=len(BLOCK_TYPES),
-                                                     dtype=np.uint8)
+            # Same as keras to_categorical, without importing tensorflow
+            self.oneHotEncodedCache = np.eye(len(BLOCK_TYPES), dtype=np.uint8)[self.environment.flatten()]
         return self.oneHotEncodedCache
 
+    def getBlockCount(self, block: int) -> int:
+        return int(self.blockCounts[block])
+
     def getWoodLeft(self):
-        if self.woodLeftCache is None:
-            self.woodLeftCache = np.count_nonzero(self.environment.flatten() == Blocks.WOOD)
-        return self.woodLeftCache
+        return int(self.blockCounts[Blocks.WOOD])
 
     # Return if there is block on each layer of environment
     def getWoodBlocks(self) -> List[bool]:
-        if not self.woodBlocksCache:
-            self.woodBlocksCache = []
-            for z in range(WORLD_SHAPE.z):
-                if np.count_nonzero(self.environment[z].flatten() == Blocks.WOOD):
-                    self.woodBlocksCache.append(True)
-                else:
-                    self.woodBlocksCache.append(False)
-        return self.woodBlocksCache
-
-    # region Environment Generation
-    def _generateGround(self):
-        for x in range(WORLD_SHAPE.x):
-            for y in range(WORLD_SHAPE.y):
-                height = int(random() * 2)  # 0 or 1
-                self.environment[0][y][x] = Blocks.GROUND
-                self.environment[height][y][x] = Blocks.GROUND
-
-    def _generateTree(self, tree_blocks_to_generate=6):
-        height = randint(MIN_TREE_HEIGHT, MAX_TREE_HEIGHT)
-
-        # generate tree from top
-        for i in range(height, height - tree_blocks_to_generate, -1):
-            self.environment[i][self.center][self.center] = Blocks.WOOD
+        return (self.woodPerLayer > 0).tolist()
 
-        self.__generateLeafs(1, height)
-        for h in range(height - 1, height - 3, -1):
-            self.__generateLeafs(2, h)
+    def _countBlocks(self):
+        # Full count, only after the environment was written directly (generation)
+        self.blockCounts = np.bincount(self.environment.ravel(), minlength=len(BLOCK_TYPES))
+        self.woodPerLayer = np.count_nonzero(self.environment == Blocks.WOOD, axis=(1, 2))
+        self.chunks = countChunkBlocks(self.environment)
+        self.lowestWood = getLowestWood(self.environment, self.trees)
 
-        return height
-
-    def __generateLeafs(self, radius: int, height: int):
-        for y in range(0, radius + 1):
-            for x in range(0, radius + 1):
-                if x == y == 0:
-                    continue
-
-                self.environment[height][self.center + y][self.center + x] = Blocks.LEAF
-                self.environment[height][self.center + y][self.center - x] = Blocks.LEAF
-
-                self.environment[height][self.center - y][self.center + x] = Blocks.LEAF
-                self.environment[height][self.center - y][self.center - x] = Blocks.LEAF
+    # region Environment Generation
+    def _generateForest(self, random: np.random.Generator, treeCount: int = 1, tree_blocks_to_generate=6):
+        # One tree is always in the center, more trees are spread over the world (see forest.py)
+        generateGround(self.environment, random)
+        self.trees = placeTrees(self.worldShape, treeCount, random)
+        generateTrees(self.environment, self.trees, tree_blocks_to_generate, random)
 
     # endregion
 
     def isGameOver(self):
-        return (WORLD_SHAPE.x < self.player.position.x or self.player.position.x < 0
-                or WORLD_SHAPE.y < self.player.position.y or self.player.position.y < 0
-                or WORLD_SHAPE.z < self.player.position.z or self.player.position.z < 0)
-
-    def __init__(self, renderer=None, tree_blocks_to_generate=6) -> None:
-        self.environment = np.zeros((WORLD_SHAPE.z, WORLD_SHAPE.y, WORLD_SHAPE.x), dtype=np.uint8)
-        self.player = Player()
+        return (self.worldShape.x < self.player.position.x or self.player.position.x < 0
+                or self.worldShape.y < self.player.position.y or self.player.position.y < 0
+                or self.worldShape.z < self.player.position.z or self.player.position.z < 0)
+
+    def __init__(self, renderer=None, tree_blocks_to_generate=6, worldShape: Vec3 = WORLD_SHAPE, treeCount: int = 1,
+                 seed: int = None, random: np.random.Generator = None) -> None:
+        self.worldShape = worldShape
+        self.center = Vec2(worldShape.x // 2, worldShape.y // 2)
+        # All randomness of the world comes from random (eg. the generator of the env), a new one when seed is set
+        if random is None:
+            random = WORLD_RANDOM if seed is None else np.random.default_rng(seed)
+        self.environment = np.zeros((worldShape.z, worldShape.y, worldShape.x), dtype=np.uint8)
+        self.player = Player(random, worldShape)
         self.renderer = renderer
-        self._generateGround()
 
         self.attackedBlockCoords = None
         self.attackTicksRemaining = 0
+        self.queryCacheHits = Counter()
+        self.queryCacheMisses = Counter()
+
+        self._generateForest(random, treeCount, tree_blocks_to_generate)
+        self._countBlocks()
+        if treeCount > 1:
+            # Anywhere outside of the trunks
+            self.player.position.x, self.player.position.y = getSpawnPosition(worldShape, self.trees, 1.5, random)
+        elif tree_blocks_to_generate > 4:
+            # 0-max, not in center where the tree could be
+            self.player.position.x = randNotInCenter(random, worldShape.x, 5)
+            self.player.position.y = randNotInCenter(random, worldShape.y, 5)
+
+        logger.debug("New game with %d wood", self.getWoodLeft())
+
+    def loadWorld(self, pool, index: int):
+        # Same state as a new Game with the world index of the pool (WorldPool), nothing is generated or counted
+        np.copyto(self.environment, pool.environments[index])
+        self.oneHotEncodedCache = None
+        self.worldVersion += 1
+        self.trees = pool.trees[index]  # Never written
+        self.lowestWood = pool.lowestWood[index].copy()
+        self.blockCounts = pool.blockCounts[index].copy()
+        self.woodPerLayer = pool.woodPerLayers[index].copy()
+        self.chunks = pool.chunks[index].copy()
+
+        self.player.position.x, self.player.position.y, self.player.position.z = pool.positions[index]
+        self.player.rotation.x, self.player.rotation.y = pool.rotations[index]
+        self.player.velocity.x = self.player.velocity.y = self.player.velocity.z = 0
 
-        treeHeight = self._generateTree(tree_blocks_to_generate)
-        if tree_blocks_to_generate > 4:
-            self.player.position.x = randNotInCenter(WORLD_SHAPE.x, 5)  # 0-maxX, not in center where the tree could be
-            self.player.position.y = randNotInCenter(WORLD_SHAPE.y, 5)  # 0-maxY, not in center where the tree could be
-
-        # print("Initialized Game")
-        print(f"----------- {self.getWoodLeft()} wood ---------------")
+        self.attackedBlockCoords = None
+        self.attackTicksRemaining = 0
 
     # region Player Movement
     def forward(self):
@@ -293,7 +530,7 @@ class Game:
 
             if self.attackTicksRemaining <= 0:
                 self._setBlock(coords, Blocks.AIR)
-                print("Destroyed Coords: ", coords)
+                logger.debug("Destroyed block at %s", coords)
                 return block
 
     def stopBlockAttack(self):
@@ -302,26 +539,28 @@ class Game:
 
     def getBlockInFrontOfPlayer(self, zPos: float = 1, lookingRange: float = BREAKING_RANGE,
                                 direction: Vec3 = None) -> (int, Vec3):
+        # Only the default query (looking direction from the head in breaking range) is cached
+        key = None
+        if zPos == 1 and lookingRange == BREAKING_RANGE and direction is None:
+            key = self._getQueryKey()
+            if key == self.blockInFrontKey:
+                self.queryCacheHits["getBlockInFrontOfPlayer"] += 1
+                return self.blockInFront
+            self.queryCacheMisses["getBlockInFrontOfPlayer"] += 1
+
         # position = self.player.getHeadPosition()
-        position = Vec3(self.player.position.x, self.player.position.y, self.player.position.z + zPos)
+        position = (self.player.position.x, self.player.position.y, self.player.position.z + zPos)
         if not direction:
             direction = self.player.getLookingDirectionVector()
 
-        blockPos, _ = self.__getNextBlock(position, direction)
-        while True:
-            if not self._isInEnvironment(blockPos):
-                return 0, None
-
-            if position.getLengthTo(blockPos) > lookingRange:
-                return 0, None
-
-            if self._getBlock(blockPos) != 0:
-                # self._setBlock(blockPos, 0)  # DEBUG
-                return self._getBlock(blockPos), blockPos.floor()
-
-            # self._setBlock(blockPos, Blocks.WOOD) # DEBUG
-            # self.renderer.render(self) # DEBUG
-            blockPos, _ = self.__getNextBlock(blockPos, direction)
+        if lookingRange > CHUNK_SIZE:
+            block, x, y, z, _, _ = self.castRay(position, numba_normalize(direction.asTuple()), lookingRange)
+        else:
+            block, x, y, z = numba_getBlockInFront(self.environment, position, direction.asTuple(), lookingRange)
+        result = (block, Vec3(x, y, z)) if block else (0, None)
+        if key is not None:
+            self.blockInFrontKey, self.blockInFront = key, result
+        return result
 
     def getBlockDistance(self, position: Vec3 = None, vector: Vec3 = None, maxDistance: float = 8) -> float:
         if not position:
@@ -329,29 +568,51 @@ class Game:
         if not vector:
             vector = self.player.getLookingDirectionVector()
 
-        vector = vector.normalize()
-
-        return numba_getBlockDistance(position.asTuple(), vector.asTuple(), maxDistance, self.environment)
+        return self.castRay(position.asTuple(), numba_normalize(vector.asTuple()), maxDistance)[5]
 
-    @staticmethod
-    # returns (blockPosition, rayCollisionWithTheBLock)
-    def __getNextBlock(pos: Vec3, direct: Vec3) -> (Vec3, Vec3):
-        blockPos, rayPos = numba_getNextBlock(pos.asTuple(), direct.asTuple())
-        return Vec3.fromTuple(blockPos), Vec3.fromTuple(rayPos)
+    def castRay(self, position: (float, float, float), vector: (float, float, float),
+                maxDistance: float) -> (int, int, int, int, int, float):
+        # Same as numba_castRay, rays longer than a chunk skip empty chunks
+        if maxDistance > CHUNK_SIZE:
+            return numba_castRayChunked(self.environment, self.chunks, position, vector, maxDistance)
+        return numba_castRay(self.environment, position, vector, maxDistance)
 
     # endregion
 
+    # Nearest reachable wood - lowest wood block of the nearest trunk with wood left
     def getNextWoodBlock(self) -> Vec3:
-        for z in range(WORLD_SHAPE.z):
-            if np.count_nonzero(self.environment[z].flatten() == Blocks.WOOD):
-                return Vec3(self.center, self.center, float(z))
-        return Vec3(-1, -1, -1)
+        position = self.player.position
+        key = (position.x, position.y, position.z, self.worldVersion)  # lowestWood changes only with worldVersion
+        if key == self.nextWoodBlockKey:
+            self.queryCacheHits["getNextWoodBlock"] += 1
+            return self.nextWoodBlock
+        self.queryCacheMisses["getNextWoodBlock"] += 1
+
+        x, y, z = numba_getNextWoodBlock(self.trees, self.lowestWood, position.asTuple())
+        self.nextWoodBlockKey = key
+        self.nextWoodBlock = Vec3(int(x), int(y), float(z)) if z >= 0 else Vec3(-1, -1, -1)
+        return self.nextWoodBlock
+
+    def _getQueryKey(self) -> tuple:
+        position, rotation = self.player.position, self.player.rotation
+        return position.x, position.y, position.z, rotation.x, rotation.y, self.worldVersion
+
+    def getQueryCacheStats(self) -> dict:
+        # {query: (hits, misses)} of the cached queries of this game and its player
+        hits = self.queryCacheHits + self.player.queryCacheHits
+        misses = self.queryCacheMisses + self.player.queryCacheMisses
+        return {query: (hits[query], misses[query]) for query in sorted(set(hits) | set(misses))}
+
+    def invalidateQueryCache(self):
+        # Forgets the cached results, the next getBlockInFrontOfPlayer() / getNextWoodBlock() run their query again
+        self.blockInFrontKey = None
+        self.nextWoodBlockKey = None
 
     def _isInEnvironment(self, pos: Vec3):
         pos = pos.floor()
-        if (WORLD_SHAPE.x <= pos.x or pos.x < 0
-                or WORLD_SHAPE.y <= pos.y or pos.y < 0
-                or WORLD_SHAPE.z <= pos.z or pos.z < 0):
+        if (self.worldShape.x <= pos.x or pos.x < 0
+                or self.worldShape.y <= pos.y or pos.y < 0
+                or self.worldShape.z <= pos.z or pos.z < 0):
             return False
         else:
             return True
@@ -366,16 +627,35 @@ class Game:
     def _setBlock(self, pos: Vec3, block: int) -> bool:
         pos = pos.floor()
         if self._isInEnvironment(pos):
-            if self.environment[pos.z, pos.y, pos.x] != block:
+            oldBlock = self.environment[pos.z, pos.y, pos.x]
+            if oldBlock != block:
                 self.environment[pos.z, pos.y, pos.x] = block
                 self.oneHotEncodedCache = None
-                self.woodBlocksCache = None
-                self.woodLeftCache = None
+                self.worldVersion += 1
+
+                self.blockCounts[oldBlock] -= 1
+                self.blockCounts[block] += 1
+                if (oldBlock == Blocks.AIR) != (block == Blocks.AIR):
+                    chunk = (pos.z >> CHUNK_SHIFT, pos.y >> CHUNK_SHIFT, pos.x >> CHUNK_SHIFT)
+                    self.chunks[chunk] += 1 if oldBlock == Blocks.AIR else -1
+                if oldBlock == Blocks.WOOD or block == Blocks.WOOD:
+                    self.woodPerLayer[pos.z] += 1 if block == Blocks.WOOD else -1
+                    numba_updateLowestWood(self.environment, self.trees, self.lowestWood, pos.x, pos.y)
             return True
         else:
             return False
 
     def getPlayerDistanceToCenter(self) -> float:
-        center = Vec2(self.center, self.center)
-        toCenter = self.player.position.toVec2(Axis.z).getLengthTo(center)
+        toCenter = self.player.position.toVec2(Axis.z).getLengthTo(self.center)
         return toCenter
+
+    def getPlayerDistanceToTree(self) -> float:
+        # Distance to the nearest trunk, the center one with a single tree
+        return numba_getDistanceToNearestTree(self.trees, self.player.position.asTuple())
+
+
+def createRandomGame(random: np.random.Generator, fixedTreeHeight: int = None, worldShape: Vec3 = WORLD_SHAPE,
+                     treeCount: int = 1) -> Game:
+    # New game like TreeChopEnv.reset - tree has 1-6 blocks remaining unless fixed. Same generator state -> same game
+    treeBlocks = fixedTreeHeight or int(random.integers(1, 7))
+    return Game(tree_blocks_to_generate=treeBlocks, worldShape=worldShape, treeCount=treeCount, random=random)
@@ -0,0 +1,69 @@
+"""
+Numba reloads a kernel compiled with cache=True until the file defining it changes. Kernels also read constants
+and call kernels of other modules (eg. GRAVITY of constants.py, numba_castRay of game.py), so after editing those
+the cached code would still use the old values. The sources of all modules with kernels are hashed instead and
+every numba cache file of the package is removed when the hash changes.
+
+Runs when gym_treechop.game.constants is imported - before any kernel can be loaded from the cache.
+"""
+import hashlib
+import os
+import re
+from pathlib import Path
+
+import numba
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+KEY_FILE = PACKAGE_DIR / "__pycache__" / "numba_sources.key"
+KERNEL_PATTERN = re.compile(rb"^@(?:n?jit|vectorize|guvectorize)\b", re.MULTILINE)
+
+
+def getCacheDir() -> Path:
+    # numba stores the cache files next to the sources unless NUMBA_CACHE_DIR is set
+    return Path(numba.config.CACHE_DIR) if numba.config.CACHE_DIR else PACKAGE_DIR
+
+
+def getSourcesKey() -> str:
+    # Hash of constants.py and of every module defining a numba kernel
+    digest = hashlib.sha1()
+    for path in sorted(PACKAGE_DIR.rglob("*.py")):
+        source = path.read_bytes()
+        if path.name == "constants.py" or KERNEL_PATTERN.search(source):
+            digest.update(path.relative_to(PACKAGE_DIR).as_posix().encode())
+            digest.update(source)
+    return digest.hexdigest()
+
+
+def clearNumbaCache() -> int:
+    # Returns the count of removed cache files
+    removed = 0
+    for pattern in ("*.nbi", "*.nbc"):
+        for path in getCacheDir().rglob(pattern):
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass  # Removed by another process in the meantime
+    return removed
+
+
+def checkNumbaCache():
+    # Clears the cache when the sources changed since the cache was populated
+    key = getSourcesKey()
+    try:
+        if KEY_FILE.read_text() == key:
+            return
+    except OSError:
+        pass
+
+    clearNumbaCache()
+    try:
+        KEY_FILE.parent.mkdir(exist_ok=True)
+        temporary = KEY_FILE.with_name(f"{KEY_FILE.name}.{os.getpid()}")
+        temporary.write_text(key)
+        os.replace(str(temporary), str(KEY_FILE))  # Processes starting together never read half of the key
+    except OSError:
+        pass  # Read-only installation, numba does not write its cache there either
+
+
+checkNumbaCache()
@@ -1,123 +1,145 @@
 import math
 from math import copysign
 
-from gym_treechop.game.constants import GRAVITY, TERMINAL_VELOCITY, PLAYER_RADIUS, PLAYER_HEIGHT, WORLD_SHAPE
+import numpy as np
+from numba import jit
+
+from gym_treechop.game.constants import GRAVITY, TERMINAL_VELOCITY, PLAYER_RADIUS, PLAYER_HEIGHT
 from gym_treechop.game.game import Game
-from gym_treechop.game.structures import Vec3, Axis
-from gym_treechop.game.utils import getCollisionsBottom, playerIsStanding, getCollision, \
-    getRectanglePointsAroundPointVec3, nthRoot
+from gym_treechop.game.utils import numba_getCollision, numba_playerIsStanding
+
+
+##### NUMBA functions #####
+# Same computations (and order of float operations) as the original pure python Physics,
+# see physics_regression.py. position, velocity -> float arrays (x, y, z)
+@jit(nopython=True, cache=True)
+def numba_physicsStep(position: np.ndarray, velocity: np.ndarray, environment: np.ndarray, delta: float = 0.1):
+    numba_resolveGravity(position, velocity, environment, delta)
+    numba_resolveMovement(position, velocity, environment, delta)
+    numba_slowDownXYVelocity(position, velocity, environment, delta)
+
+
+@jit(nopython=True, cache=True)
+def numba_physicsSteps(position: np.ndarray, velocity: np.ndarray, environment: np.ndarray, delta: float, count: int):
+    # count sub-steps in one call, same result as calling numba_physicsStep count times
+    for _ in range(count):
+        numba_physicsStep(position, velocity, environment, delta)
+
+
+@jit(nopython=True, cache=True)
+def numba_nthRoot(number: float, exponent: float) -> float:
+    num = abs(number)
+    result = num ** (1 / float(exponent))
+    return math.copysign(result, number)
+
+
+@jit(nopython=True, cache=True)
+def numba_resolveGravity(position: np.ndarray, velocity: np.ndarray, environment: np.ndarray, delta: float):
+    velocity[2] -= GRAVITY * delta
+    velocity[2] *= numba_nthRoot(0.98, 1 / delta)  # 0.98 -> https://www.mcpk.wiki/wiki/Vertical_Movement_Formulas
+    if abs(velocity[2]) > TERMINAL_VELOCITY:
+        velocity[2] = copysign(TERMINAL_VELOCITY, velocity[2])
+
+    posZ = position[2]
+    newZ = position[2] + velocity[2] * delta
+
+    zBottom = int(newZ)
+    if zBottom < 0:
+        zBottom = 0
+
+    zTop = int(newZ + PLAYER_HEIGHT)
+    if zTop >= environment.shape[0]:
+        zTop = environment.shape[0] - 1
+
+    for signX, signY in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+        x = position[0] + signX * PLAYER_RADIUS - signX * 0.00001
+        y = position[1] + signY * PLAYER_RADIUS - signY * 0.00001
+        if not (0 <= x < environment.shape[2] and 0 <= y < environment.shape[1]):
+            continue
+
+        # Not falling thru floor
+        if numba_getCollision(environment, x, y, zBottom):
+            if int(posZ) > int(newZ):  # Only prevents falling into the block
+                newZ = zBottom + 1
+            velocity[2] = 0
+
+        # Hitting head to ceiling detection
+        if numba_getCollision(environment, x, y, zTop):
+            newZ = zTop - PLAYER_HEIGHT - 0.00001  # Because float is not accurate enough
+            velocity[2] = 0
+
+    position[2] = newZ
+
+
+@jit(nopython=True, cache=True)
+def numba_isCollidingSide(environment: np.ndarray, position: np.ndarray, axis: int, side: int) -> int:
+    # Returns floor of the colliding point on the given axis, -1 when there is no collision.
+    # Points are the same as getRectanglePointsAroundPointVec3 around the players side.
+    sidePos = position[axis] + side * PLAYER_RADIUS
+    otherAxis = 1 - axis
+    middleZ = position[2] + (PLAYER_HEIGHT / 2 + 0.000001)  # Because float is not accurate enough
+    for signA, signZ in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+        other = position[otherAxis] + signA * PLAYER_RADIUS - signA * 0.00001
+        z = middleZ + signZ * (PLAYER_HEIGHT / 2) - signZ * 0.00001
+        if axis == 0:
+            collision = numba_getCollision(environment, sidePos, other, z)
+        else:
+            collision = numba_getCollision(environment, other, sidePos, z)
+        if collision:
+            return math.floor(sidePos)
+    return -1
+
+
+@jit(nopython=True, cache=True)
+def numba_resolveMovement(position: np.ndarray, velocity: np.ndarray, environment: np.ndarray, delta: float):
+    for axis in range(2):  # X, then Y
+        position[axis] += velocity[axis] * delta
+
+        if velocity[axis] < 0:
+            blockPos = numba_isCollidingSide(environment, position, axis, -1)
+            if blockPos != -1:
+                position[axis] = blockPos + 1 + PLAYER_RADIUS
+                velocity[axis] = 0
+        elif velocity[axis] > 0:
+            blockPos = numba_isCollidingSide(environment, position, axis, 1)
+            if blockPos != -1:
+                position[axis] = blockPos - PLAYER_RADIUS
+                velocity[axis] = 0
+
+
+@jit(nopython=True, cache=True)
+def numba_slowDownXYVelocity(position: np.ndarray, velocity: np.ndarray, environment: np.ndarray, delta: float):
+    # Air slipperiness
+    velocity[0] *= numba_nthRoot(0.91, 1 / delta)  # 0.91 -> https://www.mcpk.wiki/wiki/Slipperiness
+    velocity[1] *= numba_nthRoot(0.91, 1 / delta)  # 0.91 -> https://www.mcpk.wiki/wiki/Slipperiness
+
+    if numba_playerIsStanding(position, environment):
+        # Block slipperiness
+        velocity[0] *= numba_nthRoot(0.6, 1 / delta)  # 0.6 -> https://www.mcpk.wiki/wiki/Slipperiness
+        velocity[1] *= numba_nthRoot(0.6, 1 / delta)  # 0.6 -> https://www.mcpk.wiki/wiki/Slipperiness
 
 
 class Physics:
     # Do 0.1tick step
     @staticmethod
     def step(game: Game, delta: float = 0.1):  # Delta larger than 0.1 causes problems!
-        Physics._resolveGravity(game, delta)
-        Physics._resolveMovement(game, delta)
-        Physics._slowDownXYVelocity(game, delta)
+        player = game.player
+        position = np.array((player.position.x, player.position.y, player.position.z), dtype=np.float64)
+        velocity = np.array((player.velocity.x, player.velocity.y, player.velocity.z), dtype=np.float64)
 
-    @staticmethod
-    def _resolveGravity(game: Game, delta: float):
-        ## region # Resolve gravity acceleration #
-        game.player.velocity.z -= GRAVITY * delta
-        game.player.velocity.z *= nthRoot(0.98,
-                                          1 / delta)  # 0.98 -> https://www.mcpk.wiki/wiki/Vertical_Movement_Formulas
-        if abs(game.player.velocity.z) > TERMINAL_VELOCITY:
-            game.player.velocity.z = copysign(TERMINAL_VELOCITY, game.player.velocity.z)
-        ## endregion #                           #
-
-        posZ = game.player.position.z
-        newZ = game.player.position.z + game.player.velocity.z * delta
-
-        collisions = getCollisionsBottom(game.player.position.toVec2(Axis.z))
-
-        zBottom = int(newZ)
-        if zBottom < 0:
-            zBottom = 0
-
-        zTop = int(newZ + PLAYER_HEIGHT)
-        if zTop >= WORLD_SHAPE.z:
-            zTop = WORLD_SHAPE.z - 1
-
-        for collision in collisions:
-            # Not falling thru floor
-            blockBottom = getCollision(game.environment, Vec3(collision.x, collision.y, zBottom))
-            if blockBottom:
-                if int(posZ) > int(newZ):  # Only prevents falling into the block
-                    newZ = zBottom + 1
-                game.player.velocity.z = 0
-
-            # Hitting head to ceiling detection
-            blockTop = getCollision(game.environment, Vec3(collision.x, collision.y, zTop))
-            if blockTop:
-                # print("COLLISION top")
-                newZ = zTop - PLAYER_HEIGHT - 0.00001  # Because float is not accurate enough
-                game.player.velocity.z = 0
-
-        game.player.position.z = newZ
+        numba_physicsStep(position, velocity, game.environment, delta)
 
-    @staticmethod
-    def _resolveMovement(game: Game, delta: float):
-        ## Resolve X velocity
-        game.player.position.x += game.player.velocity.x * delta
-
-        if game.player.velocity.x < 0:
-            minusXPos = game.player.position.copy()
-            minusXPos.x -= PLAYER_RADIUS
-            minusXPos.z += PLAYER_HEIGHT / 2 + 0.000001  # Because float is not accurate enough
-            pointsMinusX = getRectanglePointsAroundPointVec3(minusXPos, PLAYER_RADIUS, PLAYER_HEIGHT / 2, Axis.x)
-            for point in pointsMinusX:
-                if getCollision(game.environment, point):
-                    # print("COLLISION front")
-                    game.player.position.x = math.floor(point.x) + 1 + PLAYER_RADIUS
-                    game.player.velocity.x = 0
-                    break
-        elif game.player.velocity.x > 0:
-            plusXPos = game.player.position.copy()
-            plusXPos.x += PLAYER_RADIUS
-            plusXPos.z += PLAYER_HEIGHT / 2 + 0.000001  # Because float is not accurate enough
-            pointsPlusX = getRectanglePointsAroundPointVec3(plusXPos, PLAYER_RADIUS, PLAYER_HEIGHT / 2, Axis.x)
-            for point in pointsPlusX:
-                if getCollision(game.environment, point):
-                    # print("COLLISION back")
-                    game.player.position.x = math.floor(point.x) - PLAYER_RADIUS
-                    game.player.velocity.x = 0
-                    break
-
-        ## resolve Y velocity ##
-        game.player.position.y += game.player.velocity.y * delta
-
-        if game.player.velocity.y < 0:
-            minusYPos = game.player.position.copy()
-            minusYPos.y -= PLAYER_RADIUS
-            minusYPos.z += PLAYER_HEIGHT / 2 + 0.000001  # Because float is not accurate enough
-            pointsMinusY = getRectanglePointsAroundPointVec3(minusYPos, PLAYER_RADIUS, PLAYER_HEIGHT / 2, Axis.y)
-            for point in pointsMinusY:
-                if getCollision(game.environment, point):
-                    # print("COLLISION right")
-                    game.player.position.y = math.floor(point.y) + 1 + PLAYER_RADIUS
-                    game.player.velocity.y = 0
-                    break
-
-        elif game.player.velocity.y > 0:
-            plusYPos = game.player.position.copy()
-            plusYPos.y += PLAYER_RADIUS
-            plusYPos.z += PLAYER_HEIGHT / 2 + 0.000001  # Because float is not accurate enough
-            pointsPlusY = getRectanglePointsAroundPointVec3(plusYPos, PLAYER_RADIUS, PLAYER_HEIGHT / 2, Axis.y)
-            for point in pointsPlusY:
-                if getCollision(game.environment, point):
-                    # print("COLLISION left")
-                    game.player.position.y = math.floor(point.y) - PLAYER_RADIUS
-                    game.player.velocity.y = 0
-                    break
+        player.position.x, player.position.y, player.position.z = position.tolist()
+        player.velocity.x, player.velocity.y, player.velocity.z = velocity.tolist()
 
+    # count steps of delta with a single copy of the player state, eg. a whole tick - steps(game, 0.1, 10)
     @staticmethod
-    def _slowDownXYVelocity(game: Game, delta: float):
-        # Air slipperiness
-        game.player.velocity.x *= nthRoot(0.91, 1 / delta)  # 0.91 -> https://www.mcpk.wiki/wiki/Slipperiness
-        game.player.velocity.y *= nthRoot(0.91, 1 / delta)  # 0.91 -> https://www.mcpk.wiki/wiki/Slipperiness
-
-        if playerIsStanding(game.player.position, game.environment):
-            # Block slipperiness
-            game.player.velocity.x *= nthRoot(0.6, 1 / delta)  # 0.6 -> https://www.mcpk.wiki/wiki/Slipperiness
-            game.player.velocity.y *= nthRoot(0.6, 1 / delta)  # 0.6 -> https://www.mcpk.wiki/wiki/Slipperiness
+    def steps(game: Game, delta: float = 0.1, count: int = 10):
+        player = game.player
+        position = np.array((player.position.x, player.position.y, player.position.z), dtype=np.float64)
+        velocity = np.array((player.velocity.x, player.velocity.y, player.velocity.z), dtype=np.float64)
+
+        numba_physicsSteps(position, velocity, game.environment, delta, count)
+
+        player.position.x, player.position.y, player.position.z = position.tolist()
+        player.velocity.x, player.velocity.y, player.velocity.z = velocity.tolist()
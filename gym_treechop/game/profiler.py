@@ -0,0 +1,123 @@
+import math
+from functools import wraps
+from time import perf_counter
+from typing import Dict, Iterable
+
+HISTOGRAM_BINS = 20  # Bin i counts calls of 2^i - 2^(i+1) microseconds, the last one all longer calls
+
+
+class PhaseStats:
+    __slots__ = ("calls", "seconds", "maxSeconds", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.
+        self.maxSeconds = 0.
+        self.histogram = [0] * HISTOGRAM_BINS
+
+    def add(self, seconds: float):
+        self.calls += 1
+        self.seconds += seconds
+        self.maxSeconds = max(self.maxSeconds, seconds)
+        microseconds = seconds * 1e6
+        self.histogram[min(HISTOGRAM_BINS - 1, int(math.log2(microseconds)) if microseconds >= 1 else 0)] += 1
+
+
+class _Phase:
+    # Times one phase, the same instance is entered on every call of the phase (phases do not recurse)
+    __slots__ = ("stats", "start")
+
+    def __init__(self, stats: PhaseStats):
+        self.stats = stats
+        self.start = 0.
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exception):
+        self.stats.add(perf_counter() - self.start)
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exception):
+        pass
+
+
+NO_PHASE = _NoPhase()
+
+
+class StepProfiler:
+    """
+    Opt-in wall time, call counts and duration histograms per phase of a step.
+    A disabled profiler hands out one shared no-op context manager and instruments nothing.
+    Phases are inclusive - a phase called from another phase is counted in both.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.phases: Dict[str, _Phase] = {}
+        self.steps = 0
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return NO_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = _Phase(PhaseStats())
+        return phase
+
+    def countStep(self, steps: int = 1):
+        if self.enabled:
+            self.steps += steps
+
+    def instrument(self, obj, methodNames: Iterable[str]):
+        # Wraps the methods of this instance only, the class and other instances stay untouched
+        if not self.enabled:
+            return
+        for name in methodNames:
+            method = getattr(obj, name)
+            setattr(obj, name, self._wrap(method, self.phase(name)))
+
+    @staticmethod
+    def _wrap(method, phase: _Phase):
+        @wraps(method)
+        def profiled(*args, **kwargs):
+            with phase:
+                return method(*args, **kwargs)
+
+        return profiled
+
+    def reset(self):
+        self.phases = {}
+        self.steps = 0
+
+    def getStats(self) -> Dict[str, PhaseStats]:
+        return {name: phase.stats for name, phase in self.phases.items()}
+
+    def getSummary(self) -> Dict[str, float]:
+        # Scalars per phase, tagged for TensorBoard
+        summary = {}
+        steps = max(1, self.steps)
+        for name, stats in self.getStats().items():
+            summary[f"profile/{name}/ms_per_step"] = stats.seconds / steps * 1e3
+            summary[f"profile/{name}/calls_per_step"] = stats.calls / steps
+            summary[f"profile/{name}/us_per_call"] = stats.seconds / max(1, stats.calls) * 1e6
+        return summary
+
+    def dump(self) -> str:
+        steps = max(1, self.steps)
+        lines = [f"{self.steps} steps",
+                 f"{'phase':<26} | {'calls/step':>10} | {'ms/step':>8} | {'us/call':>8} | {'max us':>8} | "
+                 f"histogram (calls per 1, 2, 4, 8, ... us)"]
+        for name, stats in sorted(self.getStats().items(), key=lambda item: -item[1].seconds):
+            lastBin = max((i for i, count in enumerate(stats.histogram) if count), default=0)
+            histogram = " ".join(str(count) for count in stats.histogram[:lastBin + 1])
+            lines.append(f"{name:<26} | {stats.calls / steps:>10.2f} | {stats.seconds / steps * 1e3:>8.3f} | "
+                         f"{stats.seconds / max(1, stats.calls) * 1e6:>8.1f} | {stats.maxSeconds * 1e6:>8.0f} | "
+                         f"{histogram}")
+        return "\n".join(lines)
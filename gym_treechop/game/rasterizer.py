@@ -0,0 +1,90 @@
+import numpy as np
+
+from gym_treechop.game.constants import Blocks, PLAYER_RADIUS, PLAYER_HEIGHT
+from gym_treechop.game.game import numba_getLookingDirectionVector
+
+# Headless frames for render(mode='rgb_array') - top view (x right, y down) above a side view (x right, z up).
+# Whole environment is rasterized with array operations, no vpython needed.
+
+# BLOCK_RGB[block] -> color 0-1, Renderer uses the same colors
+BLOCK_RGB = np.zeros((4, 3), dtype=np.float64)
+BLOCK_RGB[Blocks.AIR] = (0.6, 0.8, 1)  # Sky
+BLOCK_RGB[Blocks.GROUND] = (0.9, 0.7, 0.5)
+BLOCK_RGB[Blocks.WOOD] = (0.8, 0.8, 0.4)
+BLOCK_RGB[Blocks.LEAF] = (0, 1, 0)
+
+PLAYER_RGB = (1, 0, 0)
+LOOK_RGB = (1, 0.6, 0)
+LOOK_LENGTH = 4.5
+LOOK_POINTS = 64
+
+SHADE = 0.5  # Farthest blocks are drawn with 50% brightness
+PIXELS_PER_BLOCK = 16
+
+
+def getFirstBlock(environment: np.ndarray, axis: int, reverse: bool) -> (np.ndarray, np.ndarray):
+    # First not air block along the axis -> (block, depth 0-1), air where the whole line is empty
+    solid = environment != Blocks.AIR
+    if reverse:
+        solid = np.flip(solid, axis)
+    first = solid.argmax(axis=axis)
+    blocks = np.take_along_axis(np.flip(environment, axis) if reverse else environment,
+                                np.expand_dims(first, axis), axis).squeeze(axis)
+    depth = first / max(1, environment.shape[axis] - 1)
+    return blocks, np.where(solid.any(axis=axis), depth, 0)
+
+
+def shadeBlocks(blocks: np.ndarray, depth: np.ndarray) -> np.ndarray:
+    return BLOCK_RGB[blocks] * (1 - SHADE * depth)[..., None]
+
+
+def scaleImage(image: np.ndarray, scale: int) -> np.ndarray:
+    return image.repeat(scale, axis=0).repeat(scale, axis=1)
+
+
+def drawPoints(image: np.ndarray, columns: np.ndarray, rows: np.ndarray, rgb: tuple):
+    inside = (0 <= columns) & (columns < image.shape[1]) & (0 <= rows) & (rows < image.shape[0])
+    image[rows[inside], columns[inside]] = rgb
+
+
+def drawRectangle(image: np.ndarray, left: float, top: float, right: float, bottom: float, rgb: tuple):
+    top, bottom = max(0, int(top)), min(image.shape[0], int(np.ceil(bottom)))
+    left, right = max(0, int(left)), min(image.shape[1], int(np.ceil(right)))
+    image[top:bottom, left:right] = rgb
+
+
+def rasterizeFrame(game, pixelsPerBlock: int = PIXELS_PER_BLOCK) -> np.ndarray:
+    # (height, width, 3) uint8 image of the world and the player of the game
+    player = game.player
+    return rasterizeWorld(game.environment, player.position.asTuple(), (player.rotation.x, player.rotation.y),
+                          pixelsPerBlock)
+
+
+def rasterizeWorld(environment: np.ndarray, position: (float, float, float), rotation: (float, float),
+                   pixelsPerBlock: int = PIXELS_PER_BLOCK) -> np.ndarray:
+    # Same as rasterizeFrame from the raw state, rotation -> (leftRight, upDown)
+    depthZ = environment.shape[0]
+    scale = pixelsPerBlock
+
+    topBlocks, topDepth = getFirstBlock(environment, axis=0, reverse=True)  # Looking down -> [y, x]
+    sideBlocks, sideDepth = getFirstBlock(environment, axis=1, reverse=False)  # Looking along +y -> [z, x]
+    top = scaleImage(shadeBlocks(topBlocks, topDepth), scale)
+    side = scaleImage(shadeBlocks(sideBlocks, sideDepth)[::-1], scale)  # z up
+
+    x, y, z = position
+    lookX, lookY, lookZ = numba_getLookingDirectionVector(np.array(rotation, dtype=np.float64))
+    length = np.linspace(0, LOOK_LENGTH, LOOK_POINTS) / np.sqrt(lookX ** 2 + lookY ** 2 + lookZ ** 2)
+    lookX = (x + lookX * length) * scale
+    lookY = (y + lookY * length) * scale
+    lookZ = (z + 1 + lookZ * length) * scale
+
+    radius = PLAYER_RADIUS * scale
+    drawRectangle(top, x * scale - radius, y * scale - radius, x * scale + radius, y * scale + radius, PLAYER_RGB)
+    drawPoints(top, lookX.astype(np.int64), lookY.astype(np.int64), LOOK_RGB)
+
+    sideBottom = depthZ * scale - z * scale
+    drawRectangle(side, x * scale - radius, sideBottom - PLAYER_HEIGHT * scale, x * scale + radius, sideBottom,
+                  PLAYER_RGB)
+    drawPoints(side, lookX.astype(np.int64), (depthZ * scale - lookZ).astype(np.int64), LOOK_RGB)
+
+    return (np.concatenate((top, side)) * 255).astype(np.uint8)
@@ -1,15 +1,18 @@
 from typing import List
 
+import numpy as np
 import vpython
 from vpython import vector as v
 
 from gym_treechop.game.constants import WORLD_SHAPE, Blocks
 from gym_treechop.game.game import Game
+from gym_treechop.game.rasterizer import BLOCK_RGB
+from gym_treechop.game.structures import Vec3
 
 BLOCK_COLORS = {
-    Blocks.GROUND: v(0.9, 0.7, 0.5),
-    Blocks.WOOD: v(0.8, 0.8, 0.4),
-    Blocks.LEAF: vpython.color.green
+    Blocks.GROUND: v(*BLOCK_RGB[Blocks.GROUND]),
+    Blocks.WOOD: v(*BLOCK_RGB[Blocks.WOOD]),
+    Blocks.LEAF: v(*BLOCK_RGB[Blocks.LEAF])
 }
 
 LOOK_LENGTH = 4.5
@@ -18,31 +21,22 @@ LOOK_LENGTH = 4.5
 class Renderer:
     mainRenderer: 'Renderer'
 
-    blocks: List[List[List[vpython.box]]] = []
+    blocks: List[List[List[vpython.box]]]  # blocks[z][y][x], created for each renderer
+    renderedEnvironment: np.ndarray  # Environment shown by the boxes, only blocks changed since are updated
     player: vpython.cylinder
     playerLook: vpython.cylinder
 
     def _render_blocks(self, game: Game):
-        for z in range(game.environment.shape[0]):
-            for y in range(game.environment.shape[1]):
-                for x in range(game.environment.shape[2]):
-                    block = game.environment[z][y][x]
-                    old = self.blocks[z][y][x]
-                    if block:
-                        old.visible = True
-                        color = BLOCK_COLORS[block]
-                        opacity = 0.3 if block == Blocks.LEAF else 1
-
-                        if old.color != color:
-                            old.color = color
-
-                        if old.opacity != opacity:
-                            old.opacity = opacity
-
-                    elif old:
-                        old.visible = False
-                        # old.delete()
-                        # self.blocks[z][y][x] = None
+        for z, y, x in np.argwhere(game.environment != self.renderedEnvironment):
+            block = game.environment[z, y, x]
+            box = self.blocks[z][y][x]
+            if block:
+                box.visible = True
+                box.color = BLOCK_COLORS[block]
+                box.opacity = 0.3 if block == Blocks.LEAF else 1
+            else:
+                box.visible = False
+        np.copyto(self.renderedEnvironment, game.environment)
 
     lastX = 0
     lastY = 0
@@ -60,21 +54,22 @@ class Renderer:
         self._render_blocks(game)
         self._render_player(game)
 
-    def __init__(self):
+    def __init__(self, worldShape: Vec3 = WORLD_SHAPE):
         self.mainRenderer = self
 
         self.canvas = vpython.canvas(title="Be more of who you are!", width=800, height=800)
-        self.canvas.center = v(WORLD_SHAPE.y / 2, 0, WORLD_SHAPE.x / 2)  # Camera to rotate around real center
+        self.canvas.center = v(worldShape.y / 2, 0, worldShape.x / 2)  # Camera to rotate around real center
 
         self.player = vpython.cylinder(axis=v(0, 1.8, 0), up=v(0, 0, 1), radius=0.3, color=vpython.color.red)
         self.playerLook = vpython.cylinder(axis=v(0, 0, 0), up=v(0, 0, 1), radius=0.02, color=vpython.color.orange)
 
+        self.renderedEnvironment = np.zeros((worldShape.z, worldShape.y, worldShape.x), dtype=np.uint8)  # All air
         self.blocks = []
-        for z in range(WORLD_SHAPE.z):
+        for z in range(worldShape.z):
             self.blocks.append([])
-            for y in range(WORLD_SHAPE.y):
+            for y in range(worldShape.y):
                 self.blocks[z].append([])
-                for x in range(WORLD_SHAPE.x):
+                for x in range(worldShape.x):
                     block = vpython.box(pos=v(x + 0.5, z + 0.5, y + 0.5), size=v(1, 1, 1))
                     block.visible = False
                     self.blocks[z][y].append(block)
@@ -4,14 +4,14 @@ from typing import List
 import numpy as np
 from numba import jit
 
-from gym_treechop.game.constants import WORLD_SHAPE, PLAYER_RADIUS, Blocks
+from gym_treechop.game.constants import PLAYER_RADIUS, Blocks
 from gym_treechop.game.structures import Vec2, Vec3, Axis
 
 
-def getCollisionsBottom(pos: Vec2) -> List[Vec2]:
+def getCollisionsBottom(pos: Vec2, environment: np.ndarray) -> List[Vec2]:
     points = getRectanglePointsAroundPointVec2(pos, PLAYER_RADIUS, PLAYER_RADIUS)
-    points = [point.floor() for point in points if 0 <= point.x < WORLD_SHAPE.x]
-    points = [point.floor() for point in points if 0 <= point.y < WORLD_SHAPE.y]
+    points = [point.floor() for point in points if 0 <= point.x < environment.shape[2]]
+    points = [point.floor() for point in points if 0 <= point.y < environment.shape[1]]
     return points
 
 
@@ -25,7 +25,7 @@ def playerIsStanding(position: Vec3, environment: np.ndarray) -> bool:
     if posZ >= environment.shape[0]:
         posZ = environment.shape[0] - 1
 
-    collisions = getCollisionsBottom(position.toVec2(Axis.z))
+    collisions = getCollisionsBottom(position.toVec2(Axis.z), environment)
 
     for collision in collisions:
         block = getCollision(environment, Vec3(collision.x, collision.y, posZ))
@@ -66,7 +66,7 @@ def getCollision(environment: np.ndarray, pos: Vec3) -> int:
     posY = math.floor(pos.y)
     posZ = math.floor(pos.z)
 
-    if 0 <= posX < WORLD_SHAPE.x and 0 <= posY < WORLD_SHAPE.y and 0 <= posZ < WORLD_SHAPE.z:
+    if 0 <= posX < environment.shape[2] and 0 <= posY < environment.shape[1] and 0 <= posZ < environment.shape[0]:
         # Block is in environment
         return environment[posZ][posY][posX]
 
@@ -79,9 +79,40 @@ def nthRoot(number: float, exponent: float) -> float:
     return math.copysign(result, number)
 
 
-@jit(nopython=True)
-def getDistance(fromPos: (float, float, float), toPos: (float, float, float)) -> float:
-    lengthX = fromPos[0] - toPos[0]
-    lengthY = fromPos[1] - toPos[1]
-    lengthZ = fromPos[2] - toPos[2]
-    return math.sqrt(lengthX ** 2 + lengthY ** 2 + lengthZ ** 2)
+@jit(nopython=True, cache=True)
+def numba_getCollision(environment: np.ndarray, x: float, y: float, z: float) -> int:
+    posX = math.floor(x)
+    posY = math.floor(y)
+    posZ = math.floor(z)
+
+    if 0 <= posX < environment.shape[2] and 0 <= posY < environment.shape[1] and 0 <= posZ < environment.shape[0]:
+        # Block is in environment
+        return environment[posZ, posY, posX]
+
+    return 0  # Blocks.AIR
+
+
+@jit(nopython=True, cache=True)
+def numba_isCollidingBottom(environment: np.ndarray, position: np.ndarray, z: int) -> bool:
+    # Same points (and float rounding) as getCollisionsBottom, without the Vec2 allocations
+    for signX, signY in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+        x = position[0] + signX * PLAYER_RADIUS - signX * 0.00001
+        y = position[1] + signY * PLAYER_RADIUS - signY * 0.00001
+        if 0 <= x < environment.shape[2] and 0 <= y < environment.shape[1]:
+            if numba_getCollision(environment, x, y, z):
+                return True
+    return False
+
+
+@jit(nopython=True, cache=True)
+def numba_playerIsStanding(position: np.ndarray, environment: np.ndarray) -> bool:
+    if position[2] % 1:
+        return False  # Not a integer -> Not standing on a block
+
+    posZ = int(position[2]) - 1
+    if posZ < 0:
+        posZ = 0
+    if posZ >= environment.shape[0]:
+        posZ = environment.shape[0] - 1
+
+    return numba_isCollidingBottom(environment, position, posZ)
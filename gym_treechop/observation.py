@@ -0,0 +1,143 @@
+"""
+Layout of the observation and the rendering of its viewport, shared by TreeChopEnv and BatchedTreeChop.
+Does not import gym, so SharedMemoryVecEnv workers load only numpy, numba and the engine.
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+from numba import jit, prange
+
+from gym_treechop.game.game import numba_getBlockDistance
+
+# Default viewport, TreeChopEnv(viewportResX=..., viewportResY=..., viewportFov=..., foveatedViewport=...) changes it
+VIEWPORT_RES_X = 64
+VIEWPORT_RES_Y = 64
+VIEWPORT_FOV = 128 / 180 * math.pi  # 128° in radians
+FOVEA_DENSITY = 2  # Foveated viewport has 2x denser rays in the center than the uniform one of the same resolution
+MAX_BLOCK_DISTANCE = 8
+
+# Viewport cache - the viewport is not rendered again while the exact position, rotation and world version stay
+# the same, so a reused viewport is always the one a new render would give
+VIEWPORT_KEY_SIZE = 6  # (x, y, z, leftRight, upDown, world version)
+
+OBSERVATION_VIEWPORT_START = 6  # Viewport follows velocity, distance and rotation to the target and looking_at
+
+
+##### NUMBA functions #####
+@jit(nopython=True, cache=True)
+def numba_updateViewportKey(key: np.ndarray, playerPos: (float, float, float), rotation: (float, float),
+                            worldVersion: int) -> bool:
+    # True when key already is the key of this view (viewport can be reused), otherwise key is updated
+    x, y, z = playerPos
+    if (key[0] == x and key[1] == y and key[2] == z and key[3] == rotation[0] and key[4] == rotation[1]
+            and key[5] == worldVersion):
+        return True
+    key[0], key[1], key[2], key[3], key[4], key[5] = x, y, z, rotation[0], rotation[1], worldVersion
+    return False
+
+
+@jit(nopython=True, cache=True)
+def numba_getViewRotationMatrix(lookingVector: (float, float, float)) -> np.ndarray:
+    # Columns are the world space forward, left and up vectors of the player's view
+    x, y, z = lookingVector
+    length = math.sqrt(x ** 2 + y ** 2 + z ** 2)
+    x, y, z = x / length, y / length, z / length
+
+    horizontal = math.sqrt(x ** 2 + y ** 2)
+    if horizontal:
+        cosLeftRight, sinLeftRight = x / horizontal, y / horizontal
+    else:
+        cosLeftRight, sinLeftRight = 1.0, 0.0  # Looking straight up or down
+
+    matrix = np.empty((3, 3))
+    matrix[0, 0], matrix[1, 0], matrix[2, 0] = x, y, z
+    matrix[0, 1], matrix[1, 1], matrix[2, 1] = -sinLeftRight, cosLeftRight, 0.
+    matrix[0, 2], matrix[1, 2], matrix[2, 2] = -z * cosLeftRight, -z * sinLeftRight, horizontal
+    return matrix
+
+
+@jit(nopython=True, cache=True)
+def numba_renderViewportRow(matrix: np.ndarray, environment: np.ndarray, playerPos: (float, float, float),
+                            rays: np.ndarray, yIndex: int, viewport: np.ndarray):
+    for xIndex in range(rays.shape[1]):
+        ray = rays[yIndex, xIndex]
+        pointingVector = (matrix[0, 0] * ray[0] + matrix[0, 1] * ray[1] + matrix[0, 2] * ray[2],
+                          matrix[1, 0] * ray[0] + matrix[1, 1] * ray[1] + matrix[1, 2] * ray[2],
+                          matrix[2, 0] * ray[0] + matrix[2, 1] * ray[1] + matrix[2, 2] * ray[2])
+        blockDistance = numba_getBlockDistance(playerPos, pointingVector, MAX_BLOCK_DISTANCE, environment)
+        blockClose = MAX_BLOCK_DISTANCE - blockDistance  # 8 = Right in front of player -> 0 = Far away
+        finalDistance = ((blockClose / 2) ** 2)  # Block distance close=4^2=16 ->0,.25,1,2.25,4,6.25,9,12.5,16 ->/16
+        viewport[yIndex, xIndex] = finalDistance
+
+
+@jit(nopython=True, cache=True)
+def numba_renderViewport(lookingVector: (float, float, float), environment: np.ndarray,
+                         playerPos: (float, float, float), rays: np.ndarray, viewport: np.ndarray):
+    # Single threaded, for callers that are already parallel (BatchedTreeChopEnv)
+    matrix = numba_getViewRotationMatrix(lookingVector)
+    for yIndex in range(rays.shape[0]):
+        numba_renderViewportRow(matrix, environment, playerPos, rays, yIndex, viewport)
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def numba_renderViewportParallel(lookingVector: (float, float, float), environment: np.ndarray,
+                                 playerPos: (float, float, float), rays: np.ndarray, viewport: np.ndarray):
+    # Rows are rendered in parallel, straight into the viewport slice of the observation
+    matrix = numba_getViewRotationMatrix(lookingVector)
+    for yIndex in prange(rays.shape[0]):
+        numba_renderViewportRow(matrix, environment, playerPos, rays, yIndex, viewport)
+
+
+##### REST of the CODE #####
+
+def getActionsCount() -> int:
+    action_attack = 1  # Attack (-1; 1) - Attacks if 0.5+
+    action_forward = 1  # Forward (-1; 1) - Forward if 0.5+
+    action_jump = 1  # Jump (-1; 1) - Jumps if 0.5+
+    action_move_left_right = 2  # Left/Right (-1; 1) - Left/Right if 0.5+
+    action_rotation_small = 4  # Rotation of 5°  X(left/right) ,Y( (-1; 1) - upDown 0-1PI, leftRight 0-2PI
+    action_rotation_large = 4  # Rotation of 10° X(left/right) ,Y( (-1; 1) - upDown 0-1PI, leftRight 0-2PI
+    actions_count = action_attack + action_forward + action_jump \
+                    + action_move_left_right + action_rotation_small + action_rotation_large
+    return actions_count
+
+
+def getObservationsCount(viewportResX: int = VIEWPORT_RES_X, viewportResY: int = VIEWPORT_RES_Y) -> int:
+    player_velocity_upDown = 1
+    distance_to_block_to_destroy = 1
+    rotation_to_block_to_destroy = 2
+    looking_at = 2  # block with penalty for destroy / no penalty for destroy
+    viewport = viewportResX * viewportResY  # Distance to blocks in front of Mike 64x64 - 128° field of view -> 1 point / 2°
+
+    observations_count = player_velocity_upDown \
+                         + distance_to_block_to_destroy + rotation_to_block_to_destroy \
+                         + looking_at + viewport
+    return observations_count
+
+
+def getFoveatedOffsets(offsets: np.ndarray) -> np.ndarray:
+    # -1 - 1 -> -1 - 1, rays are FOVEA_DENSITY times denser in the center and sparser in the periphery
+    linear = 1 / FOVEA_DENSITY
+    return linear * offsets + (1 - linear) * offsets ** 3
+
+
+@lru_cache(maxsize=None)
+def getViewportRays(resX: int = VIEWPORT_RES_X, resY: int = VIEWPORT_RES_Y, fov: float = VIEWPORT_FOV,
+                    foveated: bool = False) -> np.ndarray:
+    """
+    Ray direction of every viewport pixel relative to the looking direction, computed once per (resolution, FOV).
+    Looking direction is +x, left is +y and up is +z. Returns read only unit vectors of shape (resY, resX, 3).
+    Foveated rays keep the FOV, but are dense near the view center and sparse in the periphery.
+    """
+    upDown = (np.arange(resY) - resY / 2) / (resY / 2)  # Offset from center -1 - 1
+    leftRight = (np.arange(resX) - resX / 2) / (resX / 2)  # Offset from center -1 - 1
+    if foveated:
+        upDown, leftRight = getFoveatedOffsets(upDown), getFoveatedOffsets(leftRight)
+    upDown, leftRight = np.meshgrid(upDown * fov, leftRight * fov, indexing="ij")  # In radians
+
+    rays = np.stack((np.cos(upDown) * np.cos(leftRight),
+                     np.cos(upDown) * np.sin(leftRight),
+                     np.sin(upDown)), axis=-1)
+    rays.setflags(write=False)
+    return rays
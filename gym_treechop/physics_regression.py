@@ -0,0 +1,230 @@
+"""
+Regression harness for the numba Physics kernel.
+Replays recorded action sequences and checks, after every 0.1 tick sub-step, that the player position and
+velocity from Physics.step are bit-for-bit equal to the original pure python implementation (ReferencePhysics).
+
+Run: python -m gym_treechop.physics_regression
+"""
+import math
+import random
+import sys
+from math import copysign
+from typing import List
+
+import numpy as np
+
+from gym_treechop.game.constants import GRAVITY, TERMINAL_VELOCITY, PLAYER_RADIUS, PLAYER_HEIGHT
+from gym_treechop.game.game import Game
+from gym_treechop.game.physiscs import Physics
+from gym_treechop.game.structures import Vec3, Axis
+from gym_treechop.game.utils import getCollisionsBottom, playerIsStanding, getCollision, \
+    getRectanglePointsAroundPointVec3, nthRoot
+
+
+# Original pure python implementation of Physics, kept as the reference.
+class ReferencePhysics:
+    # Do 0.1tick step
+    @staticmethod
+    def step(game: Game, delta: float = 0.1):  # Delta larger than 0.1 causes problems!
+        ReferencePhysics._resolveGravity(game, delta)
+        ReferencePhysics._resolveMovement(game, delta)
+        ReferencePhysics._slowDownXYVelocity(game, delta)
+
+    @staticmethod
+    def _resolveGravity(game: Game, delta: float):
+        ## region # Resolve gravity acceleration #
+        game.player.velocity.z -= GRAVITY * delta
+        game.player.velocity.z *= nthRoot(0.98,
+                                          1 / delta)  # 0.98 -> https://www.mcpk.wiki/wiki/Vertical_Movement_Formulas
+        if abs(game.player.velocity.z) > TERMINAL_VELOCITY:
+            game.player.velocity.z = copysign(TERMINAL_VELOCITY, game.player.velocity.z)
+        ## endregion #                           #
+
+        posZ = game.player.position.z
+        newZ = game.player.position.z + game.player.velocity.z * delta
+
+        collisions = getCollisionsBottom(game.player.position.toVec2(Axis.z), game.environment)
+
+        zBottom = int(newZ)
+        if zBottom < 0:
+            zBottom = 0
+
+        zTop = int(newZ + PLAYER_HEIGHT)
+        if zTop >= game.environment.shape[0]:
+            zTop = game.environment.shape[0] - 1
+
+        for collision in collisions:
+            # Not falling thru floor
+            blockBottom = getCollision(game.environment, Vec3(collision.x, collision.y, zBottom))
+            if blockBottom:
+                if int(posZ) > int(newZ):  # Only prevents falling into the block
+                    newZ = zBottom + 1
+                game.player.velocity.z = 0
+
+            # Hitting head to ceiling detection
+            blockTop = getCollision(game.environment, Vec3(collision.x, collision.y, zTop))
+            if blockTop:
+                # print("COLLISION top")
+                newZ = zTop - PLAYER_HEIGHT - 0.00001  # Because float is not accurate enough
+                game.player.velocity.z = 0
+
+        game.player.position.z = newZ
+
+    @staticmethod
+    def _resolveMovement(game: Game, delta: float):
+        ## Resolve X velocity
+        game.player.position.x += game.player.velocity.x * delta
+
+        if game.player.velocity.x < 0:
+            minusXPos = game.player.position.copy()
+            minusXPos.x -= PLAYER_RADIUS
+            minusXPos.z += PLAYER_HEIGHT / 2 + 0.000001  # Because float is not accurate enough
+            pointsMinusX = getRectanglePointsAroundPointVec3(minusXPos, PLAYER_RADIUS, PLAYER_HEIGHT / 2, Axis.x)
+            for point in pointsMinusX:
+                if getCollision(game.environment, point):
+                    # print("COLLISION front")
+                    game.player.position.x = math.floor(point.x) + 1 + PLAYER_RADIUS
+                    game.player.velocity.x = 0
+                    break
+        elif game.player.velocity.x > 0:
+            plusXPos = game.player.position.copy()
+            plusXPos.x += PLAYER_RADIUS
+            plusXPos.z += PLAYER_HEIGHT / 2 + 0.000001  # Because float is not accurate enough
+            pointsPlusX = getRectanglePointsAroundPointVec3(plusXPos, PLAYER_RADIUS, PLAYER_HEIGHT / 2, Axis.x)
+            for point in pointsPlusX:
+                if getCollision(game.environment, point):
+                    # print("COLLISION back")
+                    game.player.position.x = math.floor(point.x) - PLAYER_RADIUS
+                    game.player.velocity.x = 0
+                    break
+
+        ## resolve Y velocity ##
+        game.player.position.y += game.player.velocity.y * delta
+
+        if game.player.velocity.y < 0:
+            minusYPos = game.player.position.copy()
+            minusYPos.y -= PLAYER_RADIUS
+            minusYPos.z += PLAYER_HEIGHT / 2 + 0.000001  # Because float is not accurate enough
+            pointsMinusY = getRectanglePointsAroundPointVec3(minusYPos, PLAYER_RADIUS, PLAYER_HEIGHT / 2, Axis.y)
+            for point in pointsMinusY:
+                if getCollision(game.environment, point):
+                    # print("COLLISION right")
+                    game.player.position.y = math.floor(point.y) + 1 + PLAYER_RADIUS
+                    game.player.velocity.y = 0
+                    break
+
+        elif game.player.velocity.y > 0:
+            plusYPos = game.player.position.copy()
+            plusYPos.y += PLAYER_RADIUS
+            plusYPos.z += PLAYER_HEIGHT / 2 + 0.000001  # Because float is not accurate enough
+            pointsPlusY = getRectanglePointsAroundPointVec3(plusYPos, PLAYER_RADIUS, PLAYER_HEIGHT / 2, Axis.y)
+            for point in pointsPlusY:
+                if getCollision(game.environment, point):
+                    # print("COLLISION left")
+                    game.player.position.y = math.floor(point.y) - PLAYER_RADIUS
+                    game.player.velocity.y = 0
+                    break
+
+    @staticmethod
+    def _slowDownXYVelocity(game: Game, delta: float):
+        # Air slipperiness
+        game.player.velocity.x *= nthRoot(0.91, 1 / delta)  # 0.91 -> https://www.mcpk.wiki/wiki/Slipperiness
+        game.player.velocity.y *= nthRoot(0.91, 1 / delta)  # 0.91 -> https://www.mcpk.wiki/wiki/Slipperiness
+
+        if playerIsStanding(game.player.position, game.environment):
+            # Block slipperiness
+            game.player.velocity.x *= nthRoot(0.6, 1 / delta)  # 0.6 -> https://www.mcpk.wiki/wiki/Slipperiness
+            game.player.velocity.y *= nthRoot(0.6, 1 / delta)  # 0.6 -> https://www.mcpk.wiki/wiki/Slipperiness
+
+
+# region Recorded action sequences
+ACTIONS = ["none", "forward", "backward", "left", "right", "jump", "look-left", "look-right", "attack"]
+
+SEQUENCES = 200
+SEQUENCE_LENGTH = 100  # Ticks
+SEED = 42
+
+
+def recordActionSequences(seed: int = SEED, count: int = SEQUENCES, length: int = SEQUENCE_LENGTH) -> np.ndarray:
+    # Actions are picked with a seeded generator, so every run replays the same sequences
+    rng = random.Random(seed)
+    return np.array([[rng.randrange(len(ACTIONS)) for _ in range(length)] for _ in range(count)], dtype=np.uint8)
+
+
+def applyAction(game: Game, action: str):
+    if action == "forward":
+        game.forward()
+    elif action == "backward":
+        game.backward()
+    elif action == "left":
+        game.left()
+    elif action == "right":
+        game.right()
+    elif action == "jump":
+        game.jump()
+    elif action == "look-left":
+        game.lookLeftRight(game.player.rotation.x - 0.3)
+    elif action == "look-right":
+        game.lookLeftRight(game.player.rotation.x + 0.3)
+    elif action == "attack":
+        for _ in range(10):
+            game.attackBlock(0.1)  # Destroyed blocks change the collisions
+
+# endregion
+
+
+def getPlayerState(game: Game) -> (tuple, tuple):
+    return game.player.position.asTuple(), game.player.velocity.asTuple()
+
+
+def setPlayerState(game: Game, position: tuple, velocity: tuple):
+    game.player.position.x, game.player.position.y, game.player.position.z = position
+    game.player.velocity.x, game.player.velocity.y, game.player.velocity.z = velocity
+
+
+def replaySequence(sequence: np.ndarray, seed: int, delta: float = 0.1) -> List[str]:
+    """
+    Replays one action sequence, returns description of every sub-step where the implementations differ.
+    Both implementations start each sub-step from the same state, the simulation continues with the reference one.
+    """
+    worldRandom = np.random.default_rng(seed)
+    game = Game(tree_blocks_to_generate=int(worldRandom.integers(1, 7)), random=worldRandom)
+    setPlayerState(game, game.player.position.asTuple(), (0, 0, 0))
+
+    mismatches = []
+    for tick, action in enumerate(sequence):
+        applyAction(game, ACTIONS[action])
+        for subStep in range(int(1 / delta)):
+            start = getPlayerState(game)
+
+            Physics.step(game, delta)
+            result = getPlayerState(game)
+
+            setPlayerState(game, *start)
+            ReferencePhysics.step(game, delta)
+            expected = getPlayerState(game)
+
+            # Compare bit-for-bit, not approximately
+            if tuple(map(float, result[0] + result[1])) != tuple(map(float, expected[0] + expected[1])):
+                mismatches.append(f"tick {tick}.{subStep} after '{ACTIONS[action]}': "
+                                  f"expected {expected}, got {result}")
+    return mismatches
+
+
+def main() -> int:
+    sequences = recordActionSequences()
+    print(f"Replaying {len(sequences)} action sequences of {SEQUENCE_LENGTH} ticks.")
+
+    failed = 0
+    for index, sequence in enumerate(sequences):
+        mismatches = replaySequence(sequence, seed=SEED + index)
+        if mismatches:
+            failed += 1
+            print(f"Sequence {index} - {len(mismatches)} mismatches, first: {mismatches[0]}")
+
+    print(f"Physics regression - {len(sequences) - failed}/{len(sequences)} sequences identical")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
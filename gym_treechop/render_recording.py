@@ -0,0 +1,84 @@
+"""
+Renders episodes recorded by EpisodeRecorder without vpython, episodes are rendered in parallel processes.
+Frames of each episode (initial state and every step) are saved as episode_<i>.npy (frames, height, width, 3) uint8,
+or as episode_<i>.mp4 / .gif with --format when imageio is installed.
+
+Run: python -m gym_treechop.render_recording recording.npz output_dir [--episodes 0 5] [--min-return 50]
+                                             [--workers 4] [--format npy]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from gym_treechop.EpisodeRecorder import EpisodeRecording
+from gym_treechop.game.rasterizer import rasterizeWorld, PIXELS_PER_BLOCK
+
+FORMATS = ("npy", "mp4", "gif")
+FRAMES_PER_SECOND = 5  # One step is 1 second of game time
+
+_recording: EpisodeRecording = None  # Loaded once in every worker process
+
+
+def _loadRecording(path: str):
+    global _recording
+    _recording = EpisodeRecording.load(path)
+
+
+def renderEpisode(recording: EpisodeRecording, episode: int, pixelsPerBlock: int = PIXELS_PER_BLOCK) -> np.ndarray:
+    return np.stack([rasterizeWorld(environment, position, rotation, pixelsPerBlock)
+                     for environment, position, rotation in recording.iterateStates(episode)])
+
+
+def _renderAndSave(task: tuple) -> str:
+    episode, outputDir, outputFormat, pixelsPerBlock, framesPerSecond = task
+    frames = renderEpisode(_recording, episode, pixelsPerBlock)
+    path = Path(outputDir) / f"episode_{episode}.{outputFormat}"
+    if outputFormat == "npy":
+        np.save(str(path), frames)
+    else:
+        import imageio  # Only needed for videos
+        imageio.mimsave(str(path), list(frames), fps=framesPerSecond)
+    return str(path)
+
+
+def selectEpisodes(recording: EpisodeRecording, episodes: List[int] = None, minReturn: float = None) -> List[int]:
+    selected = list(range(len(recording))) if episodes is None else episodes
+    if minReturn is not None:
+        returns = recording.getReturns()
+        selected = [episode for episode in selected if returns[episode] >= minReturn]
+    return selected
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Render recorded TreeChop episodes to frames or videos.")
+    parser.add_argument("recording", type=str, help="File written by EpisodeRecorder.save()")
+    parser.add_argument("output", type=str, help="Directory for the rendered episodes")
+    parser.add_argument("--episodes", type=int, nargs="*", default=None, help="Episodes to render (default: all)")
+    parser.add_argument("--min-return", type=float, default=None,
+                        help="Render only episodes with at least this sum of rewards")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Rendering processes (default: number of cores)")
+    parser.add_argument("--format", choices=FORMATS, default="npy", help="Output format (default: npy)")
+    parser.add_argument("--pixels-per-block", type=int, default=PIXELS_PER_BLOCK)
+    parser.add_argument("--fps", type=int, default=FRAMES_PER_SECOND, help="Frames per second of videos")
+    args = parser.parse_args()
+
+    recording = EpisodeRecording.load(args.recording)
+    episodes = selectEpisodes(recording, args.episodes, args.min_return)
+    print(f"Rendering {len(episodes)} of {len(recording)} episodes")
+    Path(args.output).mkdir(parents=True, exist_ok=True)
+
+    tasks = [(episode, args.output, args.format, args.pixels_per_block, args.fps) for episode in episodes]
+    with multiprocessing.Pool(args.workers, initializer=_loadRecording, initargs=(args.recording,)) as pool:
+        for path in pool.imap_unordered(_renderAndSave, tasks):
+            print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
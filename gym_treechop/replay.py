@@ -0,0 +1,214 @@
+"""
+Deterministic re-simulation of episodes from a world seed and the actions of every step.
+replayEpisodes() steps all episodes in one parallel numba call - no observations unless requested, no resets,
+every world stops at the end of its episode. Rewards are computed with the given RewardWeights (one for all or one
+per episode), so retuned weights are evaluated on the same trajectories without stepping the environments again.
+
+World of seed s is the first world of TreeChopEnv after env.seed(s), replayReference() replays the actions in
+TreeChopEnv itself. Running this module checks that both give the same rewards and final states, with each action
+held for 1 and for 2 ticks.
+
+Run: python -m gym_treechop.replay [--episodes 200] [--steps 50] [--seed 42] [--action-repeat 1 2]
+"""
+import argparse
+import sys
+from collections import namedtuple
+from time import perf_counter
+from typing import List, Union
+
+import numpy as np
+from numba import jit, prange
+
+from gym_treechop.BatchedTreeChop import BatchedTreeChop, numba_worldStep, numba_writeObservation, numba_isGameOver, \
+    getEpisodeEvents
+from gym_treechop.TreeChopEnv import TreeChopEnv, VIEWPORT_RES_X, VIEWPORT_RES_Y
+from gym_treechop.game.constants import WORLD_SHAPE
+from gym_treechop.game.game import createRandomGame
+from gym_treechop.game.structures import Vec3
+from gym_treechop.rewards import REWARD_TERMS, RewardWeights, getRewardWeightsArray
+
+# rewards - (episodes, steps) reward of every step, 0 after the end of the episode
+# rewardTerms - (episodes, terms) sum of every reward term (REWARD_TERMS order) over the episode
+# steps - replayed steps (actions) of every episode, dones - episode ended within the given actions
+# positions ... woodLeft - state after the last replayed step
+# observations - (episodes, steps + 1, observation) with observe, initial observation first, None otherwise
+# eventCounts - (episodes, events) counts of EPISODE_EVENTS over the episode
+ReplayResult = namedtuple("ReplayResult", ["rewards", "rewardTerms", "steps", "dones", "positions", "velocities",
+                                           "rotations", "environments", "woodLeft", "observations", "eventCounts"])
+
+EPISODES = 200
+EPISODE_STEPS = 50
+SEED = 42
+REWARD_TOLERANCE = 1e-9  # Sums of the reward terms may be rounded differently than in TreeChopEnv
+ACTION_REPEATS = [1, 2]  # Ticks per action checked by main()
+
+
+##### NUMBA functions #####
+@jit(nopython=True, parallel=True, cache=True)
+def numba_replayEpisodes(environments: np.ndarray, woodPerLayers: np.ndarray, trees: np.ndarray,
+                         lowestWood: np.ndarray, positions: np.ndarray, velocities: np.ndarray, rotations: np.ndarray,
+                         attackedBlocks: np.ndarray, attackTicksRemaining: np.ndarray, lookingRewards: np.ndarray,
+                         distancesToTree: np.ndarray, stepsPassed: np.ndarray, finished: np.ndarray,
+                         worldVersions: np.ndarray, actions: np.ndarray, rewardWeights: np.ndarray,
+                         maxGameLengthSteps: int, rays: np.ndarray, observe: bool, observations: np.ndarray,
+                         viewportKeys: np.ndarray, stepRewards: np.ndarray, stepTerms: np.ndarray,
+                         episodeTerms: np.ndarray, dones: np.ndarray, replayedSteps: np.ndarray, actionRepeat: int,
+                         eventCounts: np.ndarray):
+    # Same as numba_batchStep for every step of actions[:, step], each world stops when its episode is done
+    for i in prange(environments.shape[0]):
+        environment = environments[i]
+        if observe:
+            numba_writeObservation(environment, trees[i], lowestWood[i], positions[i], velocities[i], rotations[i],
+                                   rays, observations[i, 0], viewportKeys[i], worldVersions[i])
+
+        for step in range(actions.shape[1]):
+            for _ in range(actionRepeat):
+                if not (finished[i] or numba_isGameOver(environment, positions[i])):
+                    stepRewards[i, step] += numba_worldStep(environment, woodPerLayers[i], trees[i], lowestWood[i],
+                                                            positions[i], velocities[i], rotations[i],
+                                                            attackedBlocks[i], attackTicksRemaining, lookingRewards,
+                                                            distancesToTree, finished, worldVersions, i,
+                                                            actions[i, step], rewardWeights[i], stepTerms[i],
+                                                            eventCounts[i])
+                    episodeTerms[i] += stepTerms[i]
+                stepsPassed[i] += 1
+
+                dones[i] = (finished[i] or numba_isGameOver(environment, positions[i])
+                            or woodPerLayers[i].sum() == 0 or stepsPassed[i] >= maxGameLengthSteps)
+                if dones[i]:
+                    break
+            replayedSteps[i] = step + 1
+
+            if observe:
+                numba_writeObservation(environment, trees[i], lowestWood[i], positions[i], velocities[i],
+                                       rotations[i], rays, observations[i, step + 1], viewportKeys[i],
+                                       worldVersions[i])
+            if dones[i]:
+                break
+
+
+##### REST of the CODE #####
+
+def replayEpisodes(seeds: List[int], actions: np.ndarray,
+                   rewardWeights: Union[RewardWeights, List[RewardWeights]] = None, observe: bool = False,
+                   maxGameLengthSteps: int = 50, fixedTreeHeight: int = None, worldShape: Vec3 = WORLD_SHAPE,
+                   treeCount: int = 1, viewportResX: int = VIEWPORT_RES_X, viewportResY: int = VIEWPORT_RES_Y,
+                   foveatedViewport: bool = False, actionRepeat: int = 1) -> ReplayResult:
+    """
+    Replays episode i in the world of seeds[i] with actions[i] - (steps, 13) actions of every step.
+    Actions after the end of an episode are ignored. rewardWeights - one for all episodes or one per episode,
+    the current REWARDS by default. Each action is held for actionRepeat ticks like in BatchedTreeChop,
+    maxGameLengthSteps counts the ticks.
+    """
+    actions = np.asarray(actions, dtype=np.float32)
+    if actions.ndim != 3 or actions.shape[0] != len(seeds):
+        raise ValueError(f"Expected actions of shape ({len(seeds)}, steps, action), got {actions.shape}")
+
+    batch = BatchedTreeChop(len(seeds), maxGameLengthSteps=maxGameLengthSteps, fixedTreeHeight=fixedTreeHeight,
+                            worldShape=worldShape, treeCount=treeCount, viewportResX=viewportResX,
+                            viewportResY=viewportResY, foveatedViewport=foveatedViewport, actionRepeat=actionRepeat)
+    for i, seed in enumerate(seeds):
+        batch.loadGame(i, createRandomGame(np.random.default_rng(seed), fixedTreeHeight, worldShape, treeCount))
+
+    observationShape = batch.observationShape if observe else (0,)
+    observations = np.zeros((len(seeds), actions.shape[1] + 1 if observe else 0) + observationShape, dtype=np.float32)
+    stepRewards = np.zeros(actions.shape[:2], dtype=np.float64)
+    stepTerms = np.zeros((len(seeds), len(REWARD_TERMS)), dtype=np.float64)
+    episodeTerms = np.zeros((len(seeds), len(REWARD_TERMS)), dtype=np.float64)
+    dones = np.zeros(len(seeds), dtype=np.bool_)
+    replayedSteps = np.zeros(len(seeds), dtype=np.int64)
+    numba_replayEpisodes(batch.environments, batch.woodPerLayers, batch.trees, batch.lowestWood, batch.positions,
+                         batch.velocities, batch.rotations, batch.attackedBlocks, batch.attackTicksRemaining,
+                         batch.lookingRewards, batch.distancesToTree, batch.stepsPassed, batch.finished,
+                         batch.worldVersions, actions, getRewardWeightsArray(rewardWeights, len(seeds)),
+                         maxGameLengthSteps, batch.rays, observe, observations, batch.viewportKeys, stepRewards,
+                         stepTerms, episodeTerms, dones, replayedSteps, actionRepeat, batch.eventCounts)
+
+    return ReplayResult(rewards=stepRewards, rewardTerms=episodeTerms, steps=replayedSteps, dones=dones,
+                        positions=batch.positions, velocities=batch.velocities, rotations=batch.rotations,
+                        environments=batch.environments, woodLeft=batch.woodPerLayers.sum(axis=1),
+                        observations=observations if observe else None, eventCounts=batch.eventCounts)
+
+
+def replayReference(seed: int, actions: np.ndarray, maxGameLengthSteps: int = 50, fixedTreeHeight: int = None,
+                    worldShape: Vec3 = WORLD_SHAPE, treeCount: int = 1,
+                    actionRepeat: int = 1) -> (List[float], bool, TreeChopEnv):
+    # Same episode stepped by TreeChopEnv -> (rewards of the steps, done, env in the final state)
+    env = TreeChopEnv(maxGameLengthSteps=maxGameLengthSteps, fixedTreeHeight=fixedTreeHeight, worldShape=worldShape,
+                      treeCount=treeCount, actionRepeat=actionRepeat)
+    env.seed(seed)
+    env.reset()
+
+    rewards = []
+    done = False
+    for action in actions:
+        obs, reward, done, info = env.step(action)
+        rewards.append(reward)
+        if done:
+            break
+    return rewards, done, env
+
+
+def compareEpisode(result: ReplayResult, i: int, rewards: List[float], done: bool, env: TreeChopEnv) -> List[str]:
+    # Differences of replayed episode i from the reference one
+    game = env.game
+    differences = []
+    if result.steps[i] != len(rewards) or result.dones[i] != done:
+        differences.append(f"{result.steps[i]} steps (done {result.dones[i]}), expected {len(rewards)} (done {done})")
+    else:
+        step = np.flatnonzero(np.abs(result.rewards[i, :len(rewards)] - rewards) > REWARD_TOLERANCE)
+        if len(step):
+            differences.append(f"reward of step {step[0]} {result.rewards[i, step[0]]}, expected {rewards[step[0]]}")
+    if tuple(result.positions[i]) != game.player.position.asTuple():
+        differences.append(f"position {tuple(result.positions[i])}, expected {game.player.position.asTuple()}")
+    if tuple(result.rotations[i]) != (game.player.rotation.x, game.player.rotation.y):
+        differences.append(f"rotation {tuple(result.rotations[i])}, "
+                           f"expected {(game.player.rotation.x, game.player.rotation.y)}")
+    if not np.array_equal(result.environments[i], game.environment):
+        differences.append(f"{np.count_nonzero(result.environments[i] != game.environment)} different blocks")
+    if getEpisodeEvents(result.eventCounts[i]) != env.events.getCounts():
+        differences.append(f"events {getEpisodeEvents(result.eventCounts[i])}, expected {env.events.getCounts()}")
+    return differences
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check replayed episodes against TreeChopEnv.")
+    parser.add_argument("--episodes", type=int, default=EPISODES)
+    parser.add_argument("--steps", type=int, default=EPISODE_STEPS, help="Actions of every episode")
+    parser.add_argument("--seed", type=int, default=SEED, help="Episode i is replayed in the world of seed + i")
+    parser.add_argument("--action-repeat", type=int, nargs="+", default=ACTION_REPEATS,
+                        help="Ticks per action, the episodes are checked with each of them")
+    args = parser.parse_args()
+
+    # Actions are picked with a seeded generator, so every run replays the same episodes
+    actions = np.random.default_rng(args.seed).random((args.episodes, args.steps, 13), dtype=np.float32)
+    seeds = [args.seed + i for i in range(args.episodes)]
+    replayEpisodes(seeds[:1], actions[:1])  # Make numba to JIT compile the functions.
+
+    totalFailed = 0
+    for actionRepeat in args.action_repeat:
+        start = perf_counter()
+        result = replayEpisodes(seeds, actions, maxGameLengthSteps=args.steps, actionRepeat=actionRepeat)
+        replayTime = perf_counter() - start
+        print(f"Replayed {args.episodes} episodes with action repeat {actionRepeat}, {result.steps.sum()} steps "
+              f"in {replayTime * 1e3:.1f} ms ({result.steps.sum() / replayTime:.0f} steps/s)")
+
+        failed = 0
+        start = perf_counter()
+        for i, seed in enumerate(seeds):
+            rewards, done, env = replayReference(seed, actions[i], maxGameLengthSteps=args.steps,
+                                                 actionRepeat=actionRepeat)
+            differences = compareEpisode(result, i, rewards, done, env)
+            if differences:
+                failed += 1
+                print(f"Episode {i} (seed {seed}) - {', '.join(differences)}")
+        referenceTime = perf_counter() - start
+        print(f"TreeChopEnv took {referenceTime * 1e3:.1f} ms ({result.steps.sum() / referenceTime:.0f} steps/s)")
+
+        print(f"Replay (action repeat {actionRepeat}) - {args.episodes - failed}/{args.episodes} episodes identical")
+        totalFailed += failed
+    return 1 if totalFailed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+from collections import namedtuple
+from typing import Dict, Sequence, Union
+
+import numpy as np
+from numba import jit
+
+
+class REWARDS:
+    # Sweeties
+    LONG_LOOK_AT_TARGET = 100
+    LOOKING_AT_TARGET = 1  # For each tick
+    BEING_CLOSE_TO_TREE = 1  # 0.05  # For closer each block closer to the center ???
+    MOVE_REWARD = 0.01  # This will encourage Mike to move
+
+    # Deprecated sweeties
+    WOOD_CHOPPED = 0  # 1_000
+    WOOD_CHOPPING_PER_TICK = 0  # 2  # Up to reward x*10 = 20 ???
+
+    CHOPPING_REWARD = 0  # 0.02  # This will encourage Mike to chop
+
+    # Punishments
+    TICK_PASSED = -0.04
+    WRONG_BLOCK_DESTROYED = -5
+    DIED = 0  # -1_000  # -10_000
+
+
+# Terms of the step reward, in the order of the weights array and of the terms array of numba_computeReward
+REWARD_TERMS = ("move", "wrong_block_destroyed", "died", "long_look_at_target", "looking_at_target",
+                "being_close_to_tree", "tick_passed")
+RewardWeights = namedtuple("RewardWeights", REWARD_TERMS)
+
+# Numba can not read the fields by name from the weights array
+TERM_MOVE, TERM_WRONG_BLOCK_DESTROYED, TERM_DIED, TERM_LONG_LOOK_AT_TARGET, TERM_LOOKING_AT_TARGET, \
+    TERM_BEING_CLOSE_TO_TREE, TERM_TICK_PASSED = range(len(REWARD_TERMS))
+
+
+##### NUMBA functions #####
+@jit(nopython=True, cache=True)
+def numba_computeReward(weights: np.ndarray, terms: np.ndarray, moved: bool, wrongBlockDestroyed: bool,
+                        died: bool, lookingAtTarget: bool, standing: bool, lookingReward: float,
+                        distanceChange: float) -> (float, float, bool):
+    # Reward of one step from its quantities, terms[j] is set to the reward of REWARD_TERMS[j].
+    # Returns (reward, looking reward collected so far, target reached)
+    terms[:] = 0
+    if moved:
+        terms[TERM_MOVE] = weights[TERM_MOVE]
+    if wrongBlockDestroyed:
+        terms[TERM_WRONG_BLOCK_DESTROYED] = weights[TERM_WRONG_BLOCK_DESTROYED]
+    if died:
+        terms[TERM_DIED] = weights[TERM_DIED]
+
+    targetReached = lookingAtTarget and standing
+    if targetReached:
+        terms[TERM_LONG_LOOK_AT_TARGET] = weights[TERM_LONG_LOOK_AT_TARGET]
+        # DO NOT encourage him to jump just to get more sweeties.
+        terms[TERM_LOOKING_AT_TARGET] = 0. - lookingReward  # Not -0.
+        lookingReward = 0.
+    elif lookingAtTarget:
+        terms[TERM_LOOKING_AT_TARGET] = weights[TERM_LOOKING_AT_TARGET]
+        lookingReward += weights[TERM_LOOKING_AT_TARGET]
+    else:
+        # DO NOT encourage him to look away and then back again to get more sweeties.
+        terms[TERM_LOOKING_AT_TARGET] = 0. - lookingReward  # Not -0.
+        lookingReward = 0.
+
+    terms[TERM_BEING_CLOSE_TO_TREE] = distanceChange * weights[TERM_BEING_CLOSE_TO_TREE]
+    terms[TERM_TICK_PASSED] = weights[TERM_TICK_PASSED]
+
+    # Summed in the order of the terms
+    reward = 0.
+    for j in range(terms.shape[0]):
+        reward += terms[j]
+    return reward, lookingReward, targetReached
+
+
+##### REST of the CODE #####
+
+def getRewardWeights(**weights: float) -> RewardWeights:
+    # Current values of the REWARDS class, keyword arguments replace some of them - getRewardWeights(died=-10)
+    return RewardWeights(
+        move=float(REWARDS.MOVE_REWARD),
+        wrong_block_destroyed=float(REWARDS.WRONG_BLOCK_DESTROYED),
+        died=float(REWARDS.DIED),
+        long_look_at_target=float(REWARDS.LONG_LOOK_AT_TARGET),
+        looking_at_target=float(REWARDS.LOOKING_AT_TARGET),
+        being_close_to_tree=float(REWARDS.BEING_CLOSE_TO_TREE),
+        tick_passed=float(REWARDS.TICK_PASSED),
+    )._replace(**weights)
+
+
+def parseRewardWeights(text: str) -> RewardWeights:
+    # "died=-10,tick_passed=-0.1" -> REWARDS with these weights replaced
+    weights = {}
+    for item in filter(None, text.split(",")):
+        term, _, value = item.partition("=")
+        term = term.strip()
+        if term not in REWARD_TERMS:
+            raise ValueError(f"Unknown reward term '{term}', expected one of {', '.join(REWARD_TERMS)}")
+        weights[term] = float(value)
+    return getRewardWeights(**weights)
+
+
+def getRewardWeightsArray(rewardWeights: Union[RewardWeights, Sequence[RewardWeights], np.ndarray, None],
+                          numEnvs: int) -> np.ndarray:
+    # (numEnvs, terms) weights of every world - one RewardWeights for all worlds or one per world, None -> REWARDS
+    weights = np.array(getRewardWeights() if rewardWeights is None else rewardWeights, dtype=np.float64)
+    if weights.ndim == 1:
+        weights = np.repeat(weights[None], numEnvs, axis=0)
+    if weights.shape != (numEnvs, len(REWARD_TERMS)):
+        raise ValueError(f"Expected reward weights of {numEnvs} worlds with {len(REWARD_TERMS)} terms, "
+                         f"got shape {weights.shape}")
+    return weights
+
+
+def getRewardTerms(terms: np.ndarray) -> Dict[str, float]:
+    # Terms array -> {term name: reward}, info["reward_terms"] of a step
+    return {term: float(value) for term, value in zip(REWARD_TERMS, terms)}
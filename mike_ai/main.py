@@ -1,36 +1,141 @@
+import argparse
+import logging
 import os
 import sys
 from time import time
 
-from stable_baselines.common.policies import MlpLstmPolicy
+import numpy as np
 
 # Has to be here so the os PATH is correct for the imports
 sys.path.append(os.getcwd())
 
 from gym_treechop.TreeChopEnv import TreeChopEnv
+from gym_treechop.game.physiscs import Physics
+from gym_treechop.rewards import REWARD_TERMS, parseRewardWeights
 
-from stable_baselines import PPO2
-from stable_baselines.common.vec_env import DummyVecEnv
-from stable_baselines.common.callbacks import CheckpointCallback
+# stable-baselines and tensorflow are imported in main(). SharedMemoryVecEnv workers re-import
+# this file, importing tensorflow in each of them would take most of their startup time.
 
-from tensorflow.python.client import device_lib
+N_ENVS = 16  # Worlds stepped together by BatchedTreeChopEnv
+WORLD_POOL_SIZE = 10_000  # Worlds generated when --world-pool directory does not exist yet
+PROFILE_LOG_STEPS = 1_000  # --profile writes the step phases of the first world batch to tensorboard this often
+RECORD_EPISODES = 1_000  # Episodes evaluated headless with --record
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Train Mike to chop trees.")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Number of worker processes, 0 steps all worlds in this process (default: 0)")
+    parser.add_argument("--envs-per-worker", type=int, default=N_ENVS,
+                        help=f"Worlds stepped together in each worker process (default: {N_ENVS})")
+    parser.add_argument("--world-pool", type=str, default=None,
+                        help="Directory of pre-generated worlds copied in on reset, created when missing "
+                             f"({WORLD_POOL_SIZE} worlds), workers memory-map the same files")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time the phases of env steps and write them to tensorboard under profile/")
+    parser.add_argument("--record", type=str, default=None,
+                        help=f"Evaluate {RECORD_EPISODES} episodes headless after training and record them into this "
+                             "file (render with python -m gym_treechop.render_recording) instead of the rendered test")
+    parser.add_argument("--log-level", type=str, default="WARNING",
+                        help="Level of the gym_treechop logger, DEBUG logs every game event (default: WARNING)")
+    parser.add_argument("--reward-weights", type=parseRewardWeights, default=None,
+                        help="Reward weights replacing the REWARDS values, eg. died=-10,tick_passed=-0.1 "
+                             f"(terms: {', '.join(REWARD_TERMS)})")
+    parser.add_argument("--action-repeat", type=int, default=1,
+                        help="Ticks every action of the model is repeated for, fewer model calls per game second "
+                             "(default: 1)")
+    return parser.parse_args()
+
+
+def getWorldPool(path: str):
+    from gym_treechop.WorldPool import WorldPool
+
+    if not os.path.isdir(path):
+        print(f"Generating {WORLD_POOL_SIZE} worlds into {path}")
+        WorldPool.generate(WORLD_POOL_SIZE).save(path)
+    return WorldPool.load(path)
+
+
+def createProfileCallback():
+    from stable_baselines.common.callbacks import BaseCallback
+    import tensorflow as tf
+
+    from gym_treechop.game.profiler import StepProfiler
+
+    class ProfileCallback(BaseCallback):
+        # Phases of the worlds stepped together with world 0, a new profiler is sent after every write
+        def _on_step(self) -> bool:
+            writer = self.locals.get("writer")
+            if writer is not None and self.n_calls % PROFILE_LOG_STEPS == 0:
+                summary = self.training_env.get_attr("profiler", 0)[0].getSummary()
+                writer.add_summary(tf.Summary(value=[tf.Summary.Value(tag=tag, simple_value=value)
+                                                     for tag, value in summary.items()]), self.num_timesteps)
+                self.training_env.set_attr("profiler", StepProfiler(True), 0)
+            return True
+
+    return ProfileCallback()
+
+
+def predictWorld0(model, obs: np.ndarray, state, episodeStart: bool):
+    # The recurrent policy expects observations, LSTM state and episode start mask of all model.n_envs training
+    # worlds - the single env is world 0, the other rows are zeros. Returns (action, state for the next call)
+    observations = np.zeros((model.n_envs,) + obs.shape, dtype=obs.dtype)
+    observations[0] = obs
+    masks = np.zeros(model.n_envs, dtype=np.bool_)
+    masks[0] = episodeStart
+    actions, state = model.predict(observations, state=state, mask=masks)
+    return actions[0], state
+
+
+def recordEpisodes(model, path: str, rewardWeights=None, actionRepeat: int = 1):
+    # No rendering and no waiting, the interesting episodes are rendered offline. Worlds are stepped like in
+    # training - model.n_envs of them with the LSTM state carried between the steps
+    from stable_baselines.common.vec_env import DummyVecEnv
+    from gym_treechop.EpisodeRecorder import EpisodeRecorder
+
+    recorders = [EpisodeRecorder(TreeChopEnv(maxGameLengthSteps=160, endAfterOneBlock=False, fixedTreeHeight=6,
+                                             rewardWeights=rewardWeights, actionRepeat=actionRepeat))
+                 for _ in range(model.n_envs)]
+    env = DummyVecEnv([lambda recorder=recorder: recorder for recorder in recorders])
+    obs, state, dones = env.reset(), None, np.zeros(env.num_envs, dtype=np.bool_)
+    while sum(len(recorder.episodes) for recorder in recorders) < RECORD_EPISODES:
+        actions, state = model.predict(obs, state=state, mask=dones)
+        obs, rewards, dones, infos = env.step(actions)
+    EpisodeRecorder.saveAll(recorders, path, unfinished=False)  # Worlds stopped mid-episode are not saved
+    print(f"Recorded {sum(len(recorder.episodes) for recorder in recorders)} episodes into {path}")
 
 
 def main():
+    args = parseArgs()
+    logging.basicConfig()
+    logging.getLogger("gym_treechop").setLevel(args.log_level.upper())
+
+    from stable_baselines import PPO2
+    from stable_baselines.common.callbacks import CheckpointCallback
+    from stable_baselines.common.policies import MlpLstmPolicy
+    from tensorflow.python.client import device_lib
+
+    from gym_treechop.BatchedTreeChopEnv import BatchedTreeChopEnv
+    from gym_treechop.SharedMemoryVecEnv import SharedMemoryVecEnv
+
     print("####################################")
     print("Compute Devices:")
     print(device_lib.list_local_devices())
     print("####################################")
 
-    env = TreeChopEnv(maxGameLengthSteps=100)  # Give mike 10 seconds to find the block
-    # Optional: PPO2 requires a vectorized environment to run
-    # the env is now wrapped automatically when passing it to the constructor
-    env = DummyVecEnv([lambda: env])
-    # env = make_vec_env('CartPole-v1', n_envs=4)
+    worldPool = getWorldPool(args.world_pool) if args.world_pool else None
 
-    # TODO Try make_vec_env for faster training
-    # n_cpu = 2
-    # env = SubprocVecEnv([lambda: env for i in range(n_cpu)])
+    # Give mike 10 seconds to find the block
+    if args.workers:
+        # Worlds of each worker are stepped together, observations are returned thru shared memory
+        env = SharedMemoryVecEnv(numWorkers=args.workers, envsPerWorker=args.envs_per_worker, maxGameLengthSteps=100,
+                                 worldPool=worldPool, profile=args.profile, rewardWeights=args.reward_weights,
+                                 actionRepeat=args.action_repeat)
+    else:
+        # All worlds are stepped together in one numba call
+        env = BatchedTreeChopEnv(numEnvs=args.envs_per_worker, maxGameLengthSteps=100, worldPool=worldPool,
+                                 profile=args.profile, rewardWeights=args.reward_weights,
+                                 actionRepeat=args.action_repeat)
 
     model = PPO2(
         policy=MlpLstmPolicy,
@@ -65,8 +170,16 @@ def main():
     TIMESTAMPS = 200_000_000  # _000
     # model = PPO2.load("rl_model_373000_steps.zip", env, tensorboard_log="./hh_tensorboard/")
     # model = PPO2.load("model_checkpoints/rl_model_205000_steps.zip", env, tensorboard_log="./hh_tensorboard/")
-    model.learn(total_timesteps=TIMESTAMPS, callback=[checkpoint_callback, ], reset_num_timesteps=False)
+    callbacks = [checkpoint_callback, ]
+    if args.profile:
+        callbacks.append(createProfileCallback())
+    model.learn(total_timesteps=TIMESTAMPS, callback=callbacks, reset_num_timesteps=False)
     model.save(f"trained_{int(time())}_{TIMESTAMPS}.zip")
+    env.close()
+
+    if args.record:
+        recordEpisodes(model, args.record, args.reward_weights, args.action_repeat)
+        return
 
     print("#########################################")
     print("################ TEST: ##################")
@@ -74,16 +187,19 @@ def main():
     import matplotlib.pyplot as plt
 
     input("Press any key to start...")
-    env = TreeChopEnv(maxGameLengthSteps=160, endAfterOneBlock=False, fixedTreeHeight=6)
+    env = TreeChopEnv(maxGameLengthSteps=160, endAfterOneBlock=False, fixedTreeHeight=6,
+                      rewardWeights=args.reward_weights, actionRepeat=args.action_repeat)
 
     cumulativeReward = 0
     plt.axis([0, 5000, -20, 650])
     print("Started")
     # toPlotY = []
+    state, episodeStart = None, True  # LSTM state is carried between the steps, reset at the start of episodes
     try:
         obs = env.reset()
         for i in range(5000):  # 10 = 1 second in game
-            action, _states = model.predict(obs)
+            action, state = predictWorld0(model, obs, state, episodeStart)
+            episodeStart = False
             # print("ACTION: ", action)
 
             # action = env.action_space.sample()
@@ -117,11 +233,11 @@ def main():
                     if env._isDone():
                         env.render()
                         input("Continue...")
-                        obs = env.reset()
+                        obs, episodeStart = env.reset(), True
                 else:
                     env.render()
                     input("Continue...")
-                    obs = env.reset()
+                    obs, episodeStart = env.reset(), True
 
             # Plotting reward
             plt.scatter(i, cumulativeReward)